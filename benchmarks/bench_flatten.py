@@ -0,0 +1,87 @@
+"""Benchmark: purpose-built ``normalize_documents`` vs the former ``json_normalize`` path.
+
+Uso (desde la raíz del repo)::
+
+    python -m benchmarks.bench_flatten --documents 50000 --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+import pandas as pd
+
+from src.synthetic import generate_documents
+from src.utils import normalize_documents
+
+
+# Meta paths del aplanado anterior, tal como se llamaba a json_normalize.
+LEGACY_META = [
+    "id",
+    "number",
+    "emissionDate",
+    "documentTypeId",
+    "trackingNumber",
+    "token",
+    ["document_type", "name"],
+    ["documentType", "name"],
+    ["office", "id"],
+    ["office", "name"],
+    ["user", "id"],
+    ["user", "name"],
+    ["client", "firstName"],
+    ["client", "lastName"],
+    ["client", "company"],
+    ["client", "code"],
+    ["priceList", "id"],
+    ["priceList", "name"],
+    ["coin", "code"],
+    ["variant", "id"],
+    ["variant", "code"],
+    ["variant", "description"],
+]
+
+
+def legacy_normalize(documents: List[dict]) -> pd.DataFrame:
+    return pd.json_normalize(
+        documents,
+        record_path=["details", "items"],
+        meta=LEGACY_META,
+        sep=".",
+        errors="ignore",
+        meta_prefix="doc.",
+    )
+
+
+def _best_of(func: Callable[[List[dict]], pd.DataFrame], documents: List[dict], repeat: int) -> tuple:
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(func(documents))
+        best = min(best, time.perf_counter() - started)
+    return best, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=4, help="Ítems promedio por documento")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = list(generate_documents(args.documents, lines_per_document=args.lines))
+
+    legacy_s, legacy_rows = _best_of(legacy_normalize, documents, args.repeat)
+    flat_s, flat_rows = _best_of(normalize_documents, documents, args.repeat)
+
+    print(f"documentos={len(documents)} líneas={flat_rows}")
+    print(f"json_normalize       : {legacy_s:8.3f} s ({legacy_rows} filas)")
+    print(f"normalize_documents  : {flat_s:8.3f} s ({flat_rows} filas)")
+    print(f"speedup              : {legacy_s / flat_s:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
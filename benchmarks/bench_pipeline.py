@@ -0,0 +1,287 @@
+"""Benchmark: end-to-end report pipeline, timed per stage, with peak RSS per stage and JSON output.
+
+Uso (desde la raíz del repo)::
+
+    python -m benchmarks.bench_pipeline --sizes 10k,100k,1M --out bench.json
+    python -m benchmarks.bench_pipeline --sizes 100k --source server --compare bench.json
+
+Cada tamaño (en ítems de línea) corre en un proceso aparte para que el RSS pico no
+arrastre el tamaño anterior. Con ``--source memory`` los documentos salen directo de
+``src.synthetic``; con ``--source server`` se paginan desde ``src.fake_server`` para
+medir también la etapa de paginación.
+
+``stage_peak_rss_mb`` es el RSS pico dentro de cada etapa: en Linux se reinicia el
+high-water mark del proceso (``/proc/self/clear_refs``) al empezar la etapa y se lee
+``VmHWM`` al terminar; donde no se puede queda en ``null``. ``peak_rss_mb`` es el pico
+de toda la corrida.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+os.environ.setdefault("BSALE_TOKEN", "benchmark")
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src import api_client
+from src.api_client import fetch_bsale_data
+from src.catalogs import _rows_to_name_map, _rows_to_users_map, _rows_to_variants_dim
+from src.fake_server import FakeBsale, FakeBsaleConfig
+from src.synthetic import generate_documents
+from src.utils import (
+    EXPECTED_COLUMNS,
+    _as_ids,
+    _as_series,
+    _lookup_names,
+    _point_in_time_cost,
+    build_report_frame,
+    normalize_documents,
+)
+
+
+LINES_PER_DOCUMENT = 4
+STAGES = ("pagination", "flatten", "catalog_joins", "cost_merge", "build_report_frame", "csv_write")
+_NAME_ID_COLUMNS = {
+    "document_types": "doc.documentTypeId",
+    "users": "doc.user.id",
+    "price_lists": "doc.priceList.id",
+    "offices": "doc.office.id",
+}
+
+
+def _parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB y macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _reset_peak_rss() -> bool:
+    """Restart the process high-water mark at the current RSS (Linux >= 4.0)."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as handle:
+            handle.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _hwm_rss_mb() -> Optional[float]:
+    """``VmHWM`` (peak RSS since the last reset), or ``ru_maxrss`` outside Linux."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return _peak_rss_mb()
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _StageTimer:
+    def __init__(self) -> None:
+        self.seconds: Dict[str, Optional[float]] = {stage: None for stage in STAGES}
+        self.stage_peak_rss_mb: Dict[str, Optional[float]] = {stage: None for stage in STAGES}
+        self._process_peak_mb: Optional[float] = None
+
+    def _track_process_peak(self) -> None:
+        # El reinicio de VmHWM también reinicia ru_maxrss: el pico de la corrida se acumula aquí.
+        current = _hwm_rss_mb()
+        if current is not None:
+            self._process_peak_mb = max(self._process_peak_mb or 0.0, current)
+
+    def peak_rss_mb(self) -> Optional[float]:
+        self._track_process_peak()
+        return self._process_peak_mb
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._track_process_peak()
+        per_stage = _reset_peak_rss()
+        started = time.perf_counter()
+        yield
+        self.seconds[name] = round(time.perf_counter() - started, 4)
+        if per_stage:
+            self.stage_peak_rss_mb[name] = _hwm_rss_mb()
+        self._track_process_peak()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fetch_from_server(n_documents: int, concurrency: int) -> List[dict]:
+    # Servidor en otro proceso: si compartiera el GIL la paginación mediría también al servidor.
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.fake_server", "--port", str(port), "--documents", str(n_documents)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("No se pudo iniciar src.fake_server")
+                time.sleep(0.1)
+        api_client.BASE_URL = f"http://127.0.0.1:{port}/v1"
+        api_client._RATE_LIMITER = api_client._RateLimiter(1e6)
+        params = {"limit": "50", "expand": "details,client,office,user,coin,priceList"}
+        return fetch_bsale_data("documents", params=params, concurrency=concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run_one(line_items: int, source: str, concurrency: int) -> Dict:
+    """Run every stage once for ``line_items`` synthetic line items and return the measurements."""
+    n_documents = max(line_items // LINES_PER_DOCUMENT, 1)
+    config = FakeBsaleConfig(documents=n_documents, lines_per_document=LINES_PER_DOCUMENT)
+    catalogs = FakeBsale(config).catalogs
+    maps = (
+        _rows_to_name_map(catalogs["document_types"]),
+        _rows_to_users_map(catalogs["users"]),
+        _rows_to_name_map(catalogs["price_lists"]),
+        _rows_to_name_map(catalogs["offices"]),
+        _rows_to_variants_dim(catalogs["variants"]),
+    )
+
+    timer = _StageTimer()
+    if source == "server":
+        with timer.stage("pagination"):
+            documents = _fetch_from_server(n_documents, concurrency)
+    else:
+        documents = list(generate_documents(n_documents, lines_per_document=LINES_PER_DOCUMENT, n_variants=config.variants))
+
+    with timer.stage("flatten"):
+        df_items = normalize_documents(documents)
+    del documents
+
+    index = df_items.index
+    with timer.stage("catalog_joins"):
+        for mapping, column in zip(maps[:4], _NAME_ID_COLUMNS.values()):
+            _lookup_names(_as_ids(_as_series(df_items, [column], index)), mapping)
+    with timer.stage("cost_merge"):
+        cost = _point_in_time_cost(df_items, maps[4], index)
+    with timer.stage("build_report_frame"):
+        out = build_report_frame(df_items, maps)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with timer.stage("csv_write"):
+            out[EXPECTED_COLUMNS].to_csv(os.path.join(tmp_dir, "reporte.csv"), index=False, encoding="utf-8-sig")
+
+    return {
+        "line_items": line_items,
+        "documents": n_documents,
+        "rows": len(out),
+        "cost_hit_rate": round(float((cost > 0).mean()), 4) if len(cost) else 0.0,
+        "stages_s": timer.seconds,
+        "stage_peak_rss_mb": timer.stage_peak_rss_mb,
+        "peak_rss_mb": timer.peak_rss_mb(),
+    }
+
+
+def _compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as handle:
+        baseline = {result["line_items"]: result for result in json.load(handle)["results"]}
+    print(f"Comparación contra {baseline_path} (actual / base):")
+    for result in current["results"]:
+        base = baseline.get(result["line_items"])
+        if base is None:
+            continue
+        cells = []
+        for stage in STAGES:
+            now, before = result["stages_s"].get(stage), base["stages_s"].get(stage)
+            if now is not None and before:
+                cells.append(f"{stage}={now / before:.2f}x")
+        print(f"  {result['line_items']:>9} ítems: " + "  ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,100k,1M", help="Ítems de línea por corrida (p. ej. 10k,100k,1M)")
+    parser.add_argument("--source", choices=["memory", "server"], default="memory")
+    parser.add_argument("--concurrency", type=int, default=4, help="Páginas en paralelo con --source server")
+    parser.add_argument("--out", type=str, default=None, help="Archivo JSON de resultados (por defecto solo stdout)")
+    parser.add_argument("--compare", type=str, default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--one", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(run_one(args.one, args.source, args.concurrency)))
+        return
+
+    results = []
+    for size in (_parse_size(text) for text in args.sizes.split(",")):
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pipeline", "--one", str(size),
+             "--source", args.source, "--concurrency", str(args.concurrency)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        stages = "  ".join(f"{k}={v:.3f}s" for k, v in result["stages_s"].items() if v is not None)
+        print(f"{size:>9} ítems: {stages}  rss pico={result['peak_rss_mb']} MB")
+        results.append(result)
+
+    report = {
+        "benchmark": "bench_pipeline",
+        "revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "source": args.source,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        _compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
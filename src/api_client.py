@@ -2,12 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
+import random
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .metrics import METRICS
+from .response_cache import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTL_SECONDS,
+    RESPONSE_CACHE_DIR,
+    ResponseCache,
+    ResponseCacheSettings,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 
 load_dotenv()
@@ -16,6 +41,11 @@ load_dotenv()
 BASE_URL = os.getenv("BSALE_BASE_URL", "https://api.bsale.io/v1").rstrip("/")
 TOKEN = os.getenv("BSALE_TOKEN")
 BSALE_DEBUG = os.getenv("BSALE_DEBUG", "0") == "1"
+RATE_LIMIT = float(os.getenv("BSALE_RATE_LIMIT", "8"))
+MAX_RETRIES = int(os.getenv("BSALE_MAX_RETRIES", "5"))
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
 
 if not TOKEN:
     raise RuntimeError("No se encontró BSALE_TOKEN en .env")
@@ -27,67 +57,383 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-_SESSION = requests.Session()
-_SESSION.headers.update(HEADERS)
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """HTTP tuning shared by the sync session and ``AsyncBsaleClient``."""
+
+    pool_connections: int = 10
+    pool_maxsize: int = 32
+    keep_alive: bool = True
+    gzip: bool = True
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        defaults = cls()
+        return cls(
+            pool_connections=int(os.getenv("BSALE_POOL_CONNECTIONS", defaults.pool_connections)),
+            pool_maxsize=int(os.getenv("BSALE_POOL_MAXSIZE", defaults.pool_maxsize)),
+            keep_alive=os.getenv("BSALE_KEEP_ALIVE", "1") == "1",
+            gzip=os.getenv("BSALE_GZIP", "1") == "1",
+            connect_timeout=float(os.getenv("BSALE_CONNECT_TIMEOUT", defaults.connect_timeout)),
+            read_timeout=float(os.getenv("BSALE_READ_TIMEOUT", defaults.read_timeout)),
+        )
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def headers(self) -> Dict[str, str]:
+        headers = dict(HEADERS)
+        headers["Accept-Encoding"] = "gzip, deflate" if self.gzip else "identity"
+        headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+        return headers
+
+
+def _build_session(config: ClientConfig) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(config.headers())
+    # Los reintentos los maneja _get_page; el adapter solo aporta el pool de conexiones.
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+CLIENT_CONFIG = ClientConfig.from_env()
+_SESSION = _build_session(CLIENT_CONFIG)
+
+
+def configure_client(config: ClientConfig) -> None:
+    """Replace the shared session with one tuned by ``config``."""
+    global CLIENT_CONFIG, _SESSION
+    previous = _SESSION
+    CLIENT_CONFIG = config
+    _SESSION = _build_session(config)
+    previous.close()
 
 
 class BsaleAPIError(RuntimeError):
     """Error raised when the Bsale API returns a non-success response."""
 
 
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+
+
+def account_key() -> str:
+    """Stable, non-reversible identifier of the Bsale account behind BASE_URL/TOKEN."""
+    return hashlib.sha1(f"{BASE_URL}|{TOKEN}".encode("utf-8")).hexdigest()[:12]
+
+
+def configure_response_cache(
+    enabled: bool = True,
+    *,
+    replay: bool = False,
+    root: str = RESPONSE_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    ttl: float = DEFAULT_TTL_SECONDS,
+) -> Optional[ResponseCache]:
+    """
+    Enable (or disable) the on-disk cache of raw responses used by every paged fetch.
+
+    With ``replay`` every request must be served from the cache; a miss raises
+    ``BsaleAPIError`` instead of calling Bsale; otherwise responses that may still change
+    are reused for at most ``ttl`` seconds (see ``ResponseCache``).
+    """
+    global _RESPONSE_CACHE
+    if not enabled and not replay:
+        _RESPONSE_CACHE = None
+        return None
+    _RESPONSE_CACHE = ResponseCache(root, max_bytes=max_bytes, replay=replay, account=account_key(), ttl=ttl)
+    return _RESPONSE_CACHE
+
+
+def response_cache_settings() -> Optional[ResponseCacheSettings]:
+    return _RESPONSE_CACHE.settings if _RESPONSE_CACHE is not None else None
+
+
 def _log_debug(message: str) -> None:
     if BSALE_DEBUG:
         print(message)
 
 
-def fetch_bsale_data(
+def _extract_items(payload: Any) -> List[Dict[str, Any]]:
+    if isinstance(payload, dict):
+        return payload.get("items") or []
+    if isinstance(payload, list):
+        return payload
+    return []
+
+
+class _RateLimiter:
+    """
+    Token bucket compartido por todos los llamadores del proceso (hilos y asyncio).
+
+    La tasa se ajusta con AIMD: cada 429 la reduce a la mitad (hasta ``min_rate``)
+    y bloquea el bucket durante ``Retry-After``; cada respuesta exitosa la sube de
+    a poco hasta volver a ``max_rate``.
+    """
+
+    def __init__(self, rate: float, *, min_rate: float = 0.5, increase: float = 0.1) -> None:
+        self.max_rate = max(rate, min_rate)
+        self.min_rate = min_rate
+        self.increase = increase
+        self.rate = self.max_rate
+        self._capacity = max(self.max_rate, 1.0)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float]) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        _log_debug(f"⏳ throttling: nueva tasa {self.rate:.2f} req/s, Retry-After={retry_after}")
+
+
+_RATE_LIMITER = _RateLimiter(RATE_LIMIT)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Full-jitter exponential backoff, never shorter than ``Retry-After``."""
+    backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+    return max(backoff, retry_after or 0.0)
+
+
+def _wire_bytes(response: requests.Response) -> int:
+    """Bytes read off the socket (compressed size); ``Content-Length`` or the body as fallback."""
+    try:
+        pulled = response.raw.tell()
+    except (AttributeError, OSError):
+        pulled = 0
+    if pulled:
+        return pulled
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else len(response.content)
+
+
+def _request(
+    url: str,
+    query: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[requests.Response, Any]:
+    """
+    GET with rate limiting and retries; returns the 200 (or 304) response and its decoded body.
+
+    A 200 whose body is not valid JSON (truncated or cut by a proxy) is retried like a
+    5xx; the payload of a 304 is ``None``.
+    """
+    attempt = 0
+    while True:
+        _RATE_LIMITER.acquire()
+        _log_debug(f"GET {url} params={query}")
+
+        retry_after: Optional[float] = None
+        started = time.perf_counter()
+        try:
+            response = _SESSION.get(url, params=query, headers=headers, timeout=CLIENT_CONFIG.timeout)
+        except requests.RequestException as exc:
+            METRICS.inc("requests_total", labels={"status": "network_error"})
+            if attempt >= MAX_RETRIES:
+                raise BsaleAPIError(f"Error de red consultando {url}: {exc}") from exc
+            error = f"red: {exc}"
+        else:
+            METRICS.observe("request_seconds", time.perf_counter() - started)
+            METRICS.inc("requests_total", labels={"status": str(response.status_code)})
+            METRICS.inc("response_body_bytes_total", len(response.content))
+            METRICS.inc("response_bytes_total", _wire_bytes(response))
+            if response.status_code == 304:
+                _RATE_LIMITER.on_success()
+                return response, None
+            if response.status_code == 200:
+                try:
+                    payload = response.json()
+                except ValueError as exc:
+                    if attempt >= MAX_RETRIES:
+                        raise BsaleAPIError(f"Respuesta JSON inválida de {url}: {exc}") from exc
+                    error = f"JSON inválido: {exc}"
+                else:
+                    _RATE_LIMITER.on_success()
+                    return response, payload
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                    raise BsaleAPIError(
+                        f"Error {response.status_code} al consultar {url}: {response.text}"
+                    )
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    _RATE_LIMITER.on_throttle(retry_after)
+                error = f"HTTP {response.status_code}"
+
+        delay = _retry_delay(attempt, retry_after)
+        attempt += 1
+        METRICS.inc("retries_total")
+        _log_debug(f"↻ reintento {attempt}/{MAX_RETRIES} de {url} en {delay:.2f}s ({error})")
+        time.sleep(delay)
+
+
+def _cached_page(url: str, query: Dict[str, Any]) -> Any:
+    """Payload from the response cache, ``None`` on a miss (raises on a miss in replay mode)."""
+    cache = _RESPONSE_CACHE
+    if cache is None:
+        return None
+    payload = cache.get(url, query)
+    if payload is None and cache.replay:
+        raise BsaleAPIError(f"Modo replay: sin respuesta en caché para {url} params={query}")
+    if payload is not None:
+        METRICS.inc("response_cache_hits_total")
+        _log_debug(f"GET {url} params={query} (caché)")
+    return payload
+
+
+def _get_page(url: str, query: Dict[str, Any]) -> Any:
+    METRICS.inc("pages_total")
+    payload = _cached_page(url, query)
+    if payload is not None:
+        return payload
+    _, payload = _request(url, query)
+    if _RESPONSE_CACHE is not None:
+        _RESPONSE_CACHE.put(url, query, payload)
+    return payload
+
+
+def _iter_offset_pages(
+    url: str,
+    query_for: Callable[[int], Dict[str, Any]],
+    page_offsets: Iterable[int],
+    concurrency: int,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Fetch known offsets through a bounded thread pool, yielding pages in offset order."""
+    offsets = deque(page_offsets)
+    pending: Deque[Tuple[int, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        try:
+            while offsets or pending:
+                while offsets and len(pending) < concurrency:
+                    page_offset = offsets.popleft()
+                    pending.append((page_offset, executor.submit(_get_page, url, query_for(page_offset))))
+                page_offset, future = pending.popleft()
+                page_items = _extract_items(future.result())
+                _log_debug(f"→ página offset={page_offset} len(items)={len(page_items)}")
+                if page_items:
+                    yield page_items
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_bsale_pages(
     endpoint: str,
     params: Optional[Dict[str, Any]] = None,
     *,
     start_page: int = 1,
-    sleep_between_pages: float = 0.2,
-) -> List[Dict[str, Any]]:
-    """Fetch all items from a Bsale endpoint using limit/offset pagination."""
+    sleep_between_pages: float = 0.0,
+    concurrency: int = 1,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield each page of a Bsale endpoint as soon as it arrives.
+
+    Only the page being consumed (plus, in concurrent mode, at most
+    ``concurrency`` prefetched pages) is kept in memory. With
+    ``concurrency > 1`` the first page is fetched alone to read ``count``; the
+    remaining offsets are requested through a bounded thread pool and yielded
+    in offset order.
+    """
 
-    all_items: List[Dict[str, Any]] = []
     base_params = dict(params or {})
 
     limit = int(base_params.get("limit", 50))
     offset = int(base_params.get("offset", (max(start_page, 1) - 1) * limit))
+    url = f"{BASE_URL}/{endpoint}.json"
 
-    while True:
+    def _query(page_offset: int) -> Dict[str, Any]:
         query = dict(base_params)
         query["limit"] = limit
-        query["offset"] = offset
+        query["offset"] = page_offset
+        return query
 
-        url = f"{BASE_URL}/{endpoint}.json"
-        _log_debug(f"GET {url} params={query}")
-
-        try:
-            response = _SESSION.get(url, params=query, timeout=30)
-        except requests.RequestException as exc:
-            raise BsaleAPIError(f"Error de red consultando {url}: {exc}") from exc
+    if concurrency > 1:
+        payload = _get_page(url, _query(offset))
+        items = _extract_items(payload)
+        _log_debug(f"→ página offset={offset} len(items)={len(items)}")
+        if not items:
+            return
+        yield items
 
-        if response.status_code != 200:
-            raise BsaleAPIError(
-                f"Error {response.status_code} al consultar {url}: {response.text}"
+        count = payload.get("count") if isinstance(payload, dict) else None
+        if len(items) < limit:
+            return
+        offset += limit
+        if count is None:
+            # Sin count no se conocen los offsets: se sigue página a página.
+            yield from iter_bsale_pages(
+                endpoint,
+                {**base_params, "limit": limit, "offset": offset},
+                sleep_between_pages=sleep_between_pages,
             )
+            return
 
-        payload = response.json()
-        items: List[Dict[str, Any]]
-        if isinstance(payload, dict):
-            items = payload.get("items") or []
-        elif isinstance(payload, list):
-            items = payload
-        else:
-            items = []
+        yield from _iter_offset_pages(url, _query, range(offset, int(count), limit), concurrency)
+        return
+
+    while True:
+        payload = _get_page(url, _query(offset))
+        items = _extract_items(payload)
 
         _log_debug(f"→ página offset={offset} len(items)={len(items)}")
 
         if not items:
             break
 
-        all_items.extend(items)
+        yield items
 
         if len(items) < limit:
             break
@@ -95,4 +441,272 @@ def fetch_bsale_data(
         offset += limit
         time.sleep(max(sleep_between_pages, 0.0))
 
+
+def iter_bsale_items(
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Yield items one by one; same options as ``iter_bsale_pages``."""
+
+    for page in iter_bsale_pages(endpoint, params, **kwargs):
+        yield from page
+
+
+def fetch_bsale_data(
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    start_page: int = 1,
+    sleep_between_pages: float = 0.0,
+    concurrency: int = 1,
+) -> List[Dict[str, Any]]:
+    """Fetch all items from a Bsale endpoint using limit/offset pagination."""
+
+    all_items: List[Dict[str, Any]] = []
+    for page in iter_bsale_pages(
+        endpoint,
+        params,
+        start_page=start_page,
+        sleep_between_pages=sleep_between_pages,
+        concurrency=concurrency,
+    ):
+        all_items.extend(page)
     return all_items
+
+
+def fetch_bsale_json(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """Single GET returning the decoded payload, paced and retried like the paginated helpers."""
+    return _get_page(f"{BASE_URL}/{endpoint}.json", dict(params or {}))
+
+
+def fetch_bsale_conditional(
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    concurrency: int = 1,
+) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+    """
+    Conditional variant of ``fetch_bsale_data`` for revalidating cached catalogs.
+
+    The first page is requested with ``If-None-Match`` / ``If-Modified-Since``; a 304
+    returns ``None``. Otherwise all pages are fetched and returned together with the
+    first page's ``etag`` / ``last_modified`` validators (empty if Bsale sends none).
+    When the first page carries ``count`` the remaining offsets are fetched with
+    ``concurrency`` parallel requests, as in ``iter_bsale_pages``.
+    """
+    if _RESPONSE_CACHE is not None:
+        # Con caché de respuestas (o replay) no se revalida: se sirve lo grabado.
+        return fetch_bsale_data(endpoint, params, concurrency=concurrency), {}
+
+    query = dict(params or {})
+    limit = int(query.get("limit", 50))
+    query["limit"] = limit
+    query["offset"] = int(query.get("offset", 0))
+
+    headers: Dict[str, str] = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    METRICS.inc("pages_total")
+    url = f"{BASE_URL}/{endpoint}.json"
+    response, payload = _request(url, query, headers=headers or None)
+    if response.status_code == 304:
+        _log_debug(f"→ {endpoint}: 304 Not Modified")
+        return None
+
+    validators: Dict[str, str] = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+
+    items = list(_extract_items(payload))
+    if len(items) < limit:
+        return items, validators
+
+    count = payload.get("count") if isinstance(payload, dict) else None
+    next_offset = query["offset"] + limit
+    if count is None:
+        # Sin count no se conocen los offsets: se sigue página a página.
+        items.extend(fetch_bsale_data(endpoint, {**query, "offset": next_offset}))
+    else:
+        for page in _iter_offset_pages(
+            url, lambda offset: {**query, "offset": offset}, range(next_offset, int(count), limit), concurrency
+        ):
+            items.extend(page)
+    return items, validators
+
+
+class AsyncBsaleClient:
+    """Asyncio counterpart of ``fetch_bsale_data`` built on ``aiohttp``.
+
+    A single instance shares one ``aiohttp.ClientSession`` and caps the number
+    of in-flight requests with a semaphore, so several endpoints can be drained
+    at the same time on one event loop::
+
+        async with AsyncBsaleClient(concurrency=8) as client:
+            async for page in client.iter_pages("documents", params):
+                ...
+    """
+
+    def __init__(self, *, concurrency: int = 8, config: Optional[ClientConfig] = None) -> None:
+        if aiohttp is None:
+            raise RuntimeError("AsyncBsaleClient requiere aiohttp (pip install aiohttp)")
+        self.concurrency = max(int(concurrency), 1)
+        self.config = config or CLIENT_CONFIG
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def __aenter__(self) -> "AsyncBsaleClient":
+        connector = aiohttp.TCPConnector(
+            limit=max(self.config.pool_maxsize, self.concurrency),
+            force_close=not self.config.keep_alive,
+        )
+        self._session = aiohttp.ClientSession(
+            headers=self.config.headers(),
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.config.connect_timeout,
+                sock_read=self.config.read_timeout,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_page(self, endpoint: str, params: Dict[str, Any]) -> Any:
+        if self._session is None:
+            raise RuntimeError("AsyncBsaleClient debe usarse dentro de 'async with'")
+
+        url = f"{BASE_URL}/{endpoint}.json"
+        query = {key: str(value) for key, value in params.items()}
+        METRICS.inc("pages_total")
+        cached = _cached_page(url, query)
+        if cached is not None:
+            return cached
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            async with self._semaphore:
+                await _RATE_LIMITER.acquire_async()
+                _log_debug(f"GET {url} params={query}")
+                started = time.perf_counter()
+                try:
+                    async with self._session.get(url, params=query) as response:
+                        body = await response.read()
+                        METRICS.observe("request_seconds", time.perf_counter() - started)
+                        METRICS.inc("requests_total", labels={"status": str(response.status)})
+                        METRICS.inc("response_body_bytes_total", len(body))
+                        METRICS.inc(
+                            "response_bytes_total",
+                            getattr(response.content, "total_raw_bytes", None) or response.content_length or len(body),
+                        )
+                        if response.status == 200:
+                            try:
+                                payload = json.loads(body)
+                            except ValueError as exc:
+                                if attempt >= MAX_RETRIES:
+                                    raise BsaleAPIError(f"Respuesta JSON inválida de {url}: {exc}") from exc
+                                error = f"JSON inválido: {exc}"
+                            else:
+                                _RATE_LIMITER.on_success()
+                                if _RESPONSE_CACHE is not None:
+                                    _RESPONSE_CACHE.put(url, query, payload)
+                                return payload
+                        else:
+                            text = body.decode("utf-8", errors="replace")
+                            if response.status not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                                raise BsaleAPIError(f"Error {response.status} al consultar {url}: {text}")
+                            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                            if response.status == 429:
+                                _RATE_LIMITER.on_throttle(retry_after)
+                            error = f"HTTP {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    METRICS.inc("requests_total", labels={"status": "network_error"})
+                    if attempt >= MAX_RETRIES:
+                        raise BsaleAPIError(f"Error de red consultando {url}: {exc}") from exc
+                    error = f"red: {exc}"
+
+            delay = _retry_delay(attempt, retry_after)
+            attempt += 1
+            METRICS.inc("retries_total")
+            _log_debug(f"↻ reintento {attempt}/{MAX_RETRIES} de {url} en {delay:.2f}s ({error})")
+            await asyncio.sleep(delay)
+
+    async def iter_pages(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages in offset order, prefetching up to ``concurrency`` pages."""
+
+        base_params = dict(params or {})
+        limit = int(base_params.get("limit", 50))
+        offset = int(base_params.get("offset", 0))
+
+        def _query(page_offset: int) -> Dict[str, Any]:
+            query = dict(base_params)
+            query["limit"] = limit
+            query["offset"] = page_offset
+            return query
+
+        payload = await self.get_page(endpoint, _query(offset))
+        items = _extract_items(payload)
+        _log_debug(f"→ página offset={offset} len(items)={len(items)}")
+        if not items:
+            return
+        yield items
+
+        count = payload.get("count") if isinstance(payload, dict) else None
+        if len(items) < limit:
+            return
+        if count is None:
+            # Sin count no se conocen los offsets: se sigue página a página.
+            while len(items) == limit:
+                offset += limit
+                items = _extract_items(await self.get_page(endpoint, _query(offset)))
+                _log_debug(f"→ página offset={offset} len(items)={len(items)}")
+                if not items:
+                    return
+                yield items
+            return
+
+        offsets = list(range(offset + limit, int(count), limit))
+        pending: List[asyncio.Task] = []
+        next_index = 0
+        try:
+            while next_index < len(offsets) or pending:
+                while next_index < len(offsets) and len(pending) < self.concurrency:
+                    pending.append(
+                        asyncio.ensure_future(self.get_page(endpoint, _query(offsets[next_index])))
+                    )
+                    next_index += 1
+                page = await pending.pop(0)
+                page_items = _extract_items(page)
+                _log_debug(f"→ página len(items)={len(page_items)}")
+                if page_items:
+                    yield page_items
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch_all(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        all_items: List[Dict[str, Any]] = []
+        async for page in self.iter_pages(endpoint, params):
+            all_items.extend(page)
+        return all_items
@@ -0,0 +1,157 @@
+"""Multi-process backfill: day shards fetched and transformed in a process pool."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from . import api_client
+from .api_client import fetch_bsale_data
+from .catalog_store import CatalogStore, ensure_names, ensure_variants, refresh_catalog_store
+from .catalogs import (
+    complete_name_maps,
+    get_all_maps,
+    get_variants_for,
+    set_background_revalidation,
+    wait_for_refreshes,
+)
+from .documents import SHARD_SECONDS, complete_document_details, plan_shards, with_emission_window
+from .metrics import METRICS
+from .response_cache import ResponseCacheSettings
+from .utils import STREAM_COLUMNS, build_report_frame, ensure_data_dir, normalize_documents
+
+
+ShardTask = Tuple[int, Dict[str, str], Tuple[int, int], str, int, Optional[str], bool, List[str]]
+
+
+def _init_worker(rate_limit: float, response_cache: Optional[ResponseCacheSettings]) -> None:
+    # Cada proceso tiene su propio token bucket: se reparte la tasa global entre los workers.
+    api_client._RATE_LIMITER = api_client._RateLimiter(rate_limit)
+    # Con fork el worker hereda los sockets keep-alive del padre (abiertos al calentar los
+    # catálogos); compartirlos cruza respuestas entre procesos. La sesión heredada no se
+    # cierra para no cortar las conexiones del padre.
+    api_client._SESSION = api_client._build_session(api_client.CLIENT_CONFIG)
+    set_background_revalidation(False)
+    if response_cache is not None:
+        root, max_bytes, replay, ttl = response_cache
+        api_client.configure_response_cache(replay=replay, root=root, max_bytes=max_bytes, ttl=ttl)
+
+
+def _run_shard(task: ShardTask) -> Tuple[int, str, int, Dict]:
+    index, params, window, out_path, concurrency, catalog_db, lazy_variants, columns = task
+    # Métricas por shard: el proceso padre suma los snapshots de todos los workers.
+    METRICS.reset()
+    with METRICS.stage("fetch_documents"):
+        documents = fetch_bsale_data("documents", params=with_emission_window(params, window), concurrency=concurrency)
+        complete_document_details(documents, concurrency=max(concurrency, 4))
+
+    # Los catálogos ya quedaron en data/cache (o en el store SQLite) gracias al proceso padre.
+    with METRICS.stage("normalize"):
+        df_items = normalize_documents(documents)
+    METRICS.inc("rows_normalized_total", len(df_items))
+    variant_ids = None
+    if lazy_variants and "variant.id" in df_items.columns:
+        variant_ids = df_items["variant.id"].dropna().unique()
+    if catalog_db:
+        with CatalogStore(catalog_db) as store:
+            ensure_names(store, df_items, concurrency=max(concurrency, 4))
+            if variant_ids is not None:
+                ensure_variants(store, variant_ids, concurrency=max(concurrency, 4))
+            maps = store.maps_for(df_items)
+    else:
+        maps = get_all_maps(refresh=False, lazy_variants=lazy_variants, concurrency=max(concurrency, 4))
+        maps = complete_name_maps(maps, df_items, concurrency=max(concurrency, 4))
+        if variant_ids is not None:
+            maps = (*maps[:4], get_variants_for(variant_ids, concurrency=max(concurrency, 4)))
+    with METRICS.stage("enrich"):
+        out = build_report_frame(df_items, maps)
+    out = out.reindex(columns=columns)
+    with METRICS.stage("write_csv"):
+        out.to_csv(out_path, index=False, encoding="utf-8")
+    METRICS.inc("rows_written_total", len(out))
+    return index, out_path, len(out), METRICS.snapshot()
+
+
+def _merge_partials(partials: List[str], out_csv: str) -> None:
+    """Concatenate partial CSVs in order, keeping only the first header."""
+    with open(out_csv, "w", encoding="utf-8-sig", newline="") as target:
+        for position, path in enumerate(partials):
+            with open(path, "r", encoding="utf-8", newline="") as source:
+                header = source.readline()
+                if position == 0:
+                    target.write(header)
+                shutil.copyfileobj(source, target)
+
+
+def run_backfill(
+    params: Dict[str, str],
+    start_unix: int,
+    end_unix: int,
+    out_csv: str,
+    *,
+    workers: int,
+    concurrency: int = 1,
+    shard: str = "day",
+    catalog_db: str | None = None,
+    lazy_variants: bool = False,
+    columns: Optional[List[str]] = None,
+    debug: bool = False,
+) -> int:
+    """
+    Reparte el rango en shards diarios sobre un pool de ``workers`` procesos.
+
+    Cada worker descarga su shard, completa detalles, lo transforma y escribe un CSV
+    parcial; el proceso padre los une en orden con una sola cabecera. El layout es el
+    mismo que el de ``--stream`` (incluye ``_warn_monto``). Con ``catalog_db`` los
+    workers consultan solo los ids de su shard en el store SQLite en vez de cargar
+    cada uno todos los catálogos. Con ``lazy_variants`` no se recorre ``/variants``: cada
+    worker pide solo las variantes de su shard que falten. ``columns`` restringe las
+    columnas del reporte.
+    Devuelve las filas escritas.
+    """
+    ensure_data_dir(os.path.dirname(out_csv) or "data")
+    out_columns = columns + ["_warn_monto"] if columns else STREAM_COLUMNS
+    # Calienta la caché de catálogos una sola vez antes de lanzar los workers.
+    if catalog_db:
+        with CatalogStore(catalog_db) as store:
+            refresh_catalog_store(store, lazy_variants=lazy_variants, concurrency=max(concurrency, 4), debug=debug)
+    else:
+        get_all_maps(refresh=False, lazy_variants=lazy_variants, concurrency=max(concurrency, 4))
+        # Una revalidación pendiente terminaría en cada worker forkeado: se completa antes.
+        wait_for_refreshes()
+
+    shards = plan_shards(start_unix, end_unix, SHARD_SECONDS[shard])
+    partial_dir = tempfile.mkdtemp(prefix="backfill_", dir=os.path.dirname(out_csv) or "data")
+    tasks: List[ShardTask] = [
+        (index, params, window, os.path.join(partial_dir, f"part-{index:05d}.csv"), concurrency, catalog_db, lazy_variants, out_columns)
+        for index, window in enumerate(shards)
+    ]
+    if debug:
+        print(f"ℹ️ backfill: {len(shards)} shards en {workers} procesos")
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(api_client.RATE_LIMIT / max(workers, 1), api_client.response_cache_settings()),
+        ) as executor:
+            results = list(executor.map(_run_shard, tasks))
+
+        results.sort(key=lambda result: result[0])
+        rows = sum(count for _, _, count, _ in results)
+        for *_, snapshot in results:
+            METRICS.merge(snapshot)
+        if results:
+            _merge_partials([path for _, path, _, _ in results], out_csv)
+        else:
+            pd.DataFrame(columns=out_columns).to_csv(out_csv, index=False, encoding="utf-8-sig")
+    finally:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+
+    print(f"✅ Reporte generado en {out_csv} — {rows} filas")
+    return rows
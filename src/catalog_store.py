@@ -0,0 +1,465 @@
+"""SQLite catalog store shared across report processes, with indexed id/sku lookups."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .api_client import BsaleAPIError, fetch_bsale_data
+from .catalogs import (
+    CATALOG_TTLS,
+    NAME_ID_COLUMNS,
+    CatalogMaps,
+    _catalog_meta,
+    _is_stale,
+    _refresh_name_map,
+    _refresh_variants_dim,
+    _rows_to_variants_dim,
+    _typed_variants_dim,
+    get_document_types_map,
+    get_offices_map,
+    get_price_lists_map,
+    get_users_map,
+    get_variants_dim,
+    get_variants_for,
+    refresh_name_map_once,
+    unnamed_ids,
+    upsert_variants_dim,
+)
+
+
+CATALOG_DB_PATH = os.path.join("data", "store", "catalogs.sqlite")
+
+NAME_CATALOGS = ("document_types", "users", "price_lists", "offices")
+
+# Columnas de las líneas normalizadas que referencian cada catálogo de nombres.
+_ID_COLUMNS: Dict[str, str] = {catalog: columns[0] for catalog, columns in NAME_ID_COLUMNS.items()}
+
+# Bsale no documenta un filtro "modificado desde" para /variants. Si la cuenta expone uno,
+# se indica su nombre aquí (recibe un unix) y el refresco de costos pide solo esas variantes.
+VARIANTS_UPDATED_SINCE_PARAM = os.getenv("BSALE_VARIANTS_UPDATED_SINCE_PARAM") or None
+
+# Margen hacia atrás del filtro incremental para no perder cambios concurrentes con el sync anterior.
+UPDATED_SINCE_OVERLAP_SECONDS = 3600
+
+# Por debajo del límite de parámetros de SQLite (999 en versiones antiguas).
+_IN_CHUNK = 500
+
+_NAME_LOADERS = {
+    "document_types": get_document_types_map,
+    "users": get_users_map,
+    "price_lists": get_price_lists_map,
+    "offices": get_offices_map,
+}
+
+
+def _chunks(values: List, size: int = _IN_CHUNK) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _distinct_ids(series: pd.Series) -> List[int]:
+    return [int(value) for value in pd.to_numeric(series, errors="coerce").dropna().unique()]
+
+
+def _start_of_day(unix: float) -> float:
+    # Hora local, igual que los rangos --since/--until y el emissionDate de las ventas.
+    return datetime.fromtimestamp(unix).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+class CatalogStore:
+    """
+    Catálogos de Bsale en SQLite: una tabla por catálogo de nombres y ``variants``
+    indexada por ``id`` y por ``sku``.
+
+    Usa WAL para que varios procesos de reporte lean el mismo store mientras otro
+    lo refresca.
+    """
+
+    def __init__(self, path: str = CATALOG_DB_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "".join(
+                f"""
+                CREATE TABLE IF NOT EXISTS {name} (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                """
+                for name in NAME_CATALOGS
+            )
+            + """
+            CREATE TABLE IF NOT EXISTS variants (
+                id INTEGER PRIMARY KEY,
+                sku TEXT NOT NULL,
+                description TEXT NOT NULL,
+                cost_net_unit REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                checked_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_variants_sku ON variants (sku);
+            CREATE TABLE IF NOT EXISTS variant_costs (
+                variant_id INTEGER NOT NULL,
+                effective_from REAL NOT NULL,
+                cost_net_unit REAL NOT NULL,
+                PRIMARY KEY (variant_id, effective_from)
+            );
+            CREATE TABLE IF NOT EXISTS catalog_state (
+                catalog TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL,
+                partial INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        variant_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(variants)")}
+        if "checked_at" not in variant_columns:
+            # Stores anteriores a la columna: sin fecha de verificación, cada variante cuenta como vencida.
+            with self._conn:
+                self._conn.execute("ALTER TABLE variants ADD COLUMN checked_at REAL NOT NULL DEFAULT 0")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "CatalogStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ---------------- Escritura ----------------
+
+    def upsert_names(self, catalog: str, mapping: Dict[int, str]) -> int:
+        """Upsert ``id -> name`` rows; returns how many rows were inserted or changed."""
+        if catalog not in NAME_CATALOGS:
+            raise ValueError(f"Catálogo desconocido: {catalog}")
+        now = time.time()
+        before = self._conn.total_changes
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {catalog} (id, name, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at "
+                "WHERE name IS NOT excluded.name",
+                [(int(key), str(value), now) for key, value in mapping.items()],
+            )
+        return self._conn.total_changes - before
+
+    def upsert_variants(self, dim_variant: pd.DataFrame, *, checked_at: float | None = None) -> int:
+        """
+        Upsert a ``dim_variant`` frame; returns how many rows were inserted or changed.
+
+        Cada costo distinto del último registrado se agrega a ``variant_costs``. El cambio
+        ocurrió entre la verificación anterior de la variante y ahora, así que vale desde
+        el inicio del día de esa verificación anterior (o de hoy si no hay una): las ventas
+        de ese día ya toman el costo nuevo. La primera vez que se ve una variante su costo
+        vale desde siempre (``effective_from = 0``).
+
+        ``checked_at`` de cada fila (cuándo se verificó contra Bsale) sale de la columna
+        ``fetched_at`` si ``dim_variant`` la trae, si no de ``checked_at`` (por defecto, ahora).
+        """
+        dim_variant = dim_variant.reset_index(drop=True)
+        typed = _typed_variants_dim(dim_variant).dropna(subset=["variant_id"]).drop_duplicates("variant_id", keep="last")
+        now = time.time()
+        if "fetched_at" in dim_variant.columns:
+            checked = pd.to_numeric(dim_variant["fetched_at"], errors="coerce").fillna(0.0).loc[typed.index]
+        else:
+            checked = pd.Series(now if checked_at is None else checked_at, index=typed.index)
+        rows = [
+            (int(variant_id), str(sku), str(description), float(cost), now)
+            for variant_id, sku, description, cost in typed.itertuples(index=False, name=None)
+        ]
+        latest = self.latest_costs([row[0] for row in rows])
+        previous_check = self._checked_at(variant_id for variant_id, _, _, cost, _ in rows if variant_id in latest)
+        cost_rows = [
+            (variant_id, _start_of_day(previous_check.get(variant_id) or now) if variant_id in latest else 0.0, cost)
+            for variant_id, _, _, cost, _ in rows
+            if latest.get(variant_id) != cost
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO variant_costs (variant_id, effective_from, cost_net_unit) VALUES (?, ?, ?)",
+                cost_rows,
+            )
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO variants (id, sku, description, cost_net_unit, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET sku = excluded.sku, description = excluded.description, "
+                "cost_net_unit = excluded.cost_net_unit, updated_at = excluded.updated_at "
+                "WHERE sku IS NOT excluded.sku OR description IS NOT excluded.description "
+                "OR cost_net_unit IS NOT excluded.cost_net_unit",
+                rows,
+            )
+            changed = self._conn.total_changes - before
+            self._conn.executemany(
+                "UPDATE variants SET checked_at = MAX(checked_at, ?) WHERE id = ?",
+                [(float(value), row[0]) for value, row in zip(checked, rows)],
+            )
+        return changed
+
+    def mark_synced(self, catalog: str, *, partial: bool = False, synced_at: float | None = None) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO catalog_state (catalog, synced_at, partial) VALUES (?, ?, ?) "
+                "ON CONFLICT (catalog) DO UPDATE SET synced_at = excluded.synced_at, partial = excluded.partial",
+                (catalog, time.time() if synced_at is None else synced_at, int(partial)),
+            )
+
+    # ---------------- Lectura ----------------
+
+    def sync_state(self, catalog: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT synced_at, partial FROM catalog_state WHERE catalog = ?", (catalog,)
+        ).fetchone()
+        return {"synced_at": row[0], "partial": bool(row[1])} if row else None
+
+    def checked_variant_ids(self, ids: Iterable[int], since: float) -> set:
+        """Ids de ``ids`` verificados contra Bsale desde ``since`` (unix)."""
+        checked: set = set()
+        for chunk in _chunks(sorted({int(value) for value in ids})):
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._conn.execute(
+                f"SELECT id FROM variants WHERE id IN ({placeholders}) AND checked_at >= ?", [*chunk, since]
+            )
+            checked.update(variant_id for (variant_id,) in cursor)
+        return checked
+
+    def _checked_at(self, ids: Iterable[int]) -> Dict[int, float]:
+        checked: Dict[int, float] = {}
+        for chunk in _chunks(sorted({int(value) for value in ids})):
+            placeholders = ",".join("?" * len(chunk))
+            checked.update(
+                self._conn.execute(f"SELECT id, checked_at FROM variants WHERE id IN ({placeholders})", chunk)
+            )
+        return checked
+
+    def latest_costs(self, variant_ids: Iterable[int]) -> Dict[int, float]:
+        """Último costo registrado en ``variant_costs`` por variante."""
+        latest: Dict[int, float] = {}
+        for chunk in _chunks(sorted({int(value) for value in variant_ids})):
+            placeholders = ",".join("?" * len(chunk))
+            # Columna "bare" junto a MAX(): SQLite la toma de la fila con la vigencia más reciente.
+            cursor = self._conn.execute(
+                f"SELECT variant_id, cost_net_unit, MAX(effective_from) FROM variant_costs "
+                f"WHERE variant_id IN ({placeholders}) GROUP BY variant_id",
+                chunk,
+            )
+            latest.update((variant_id, cost) for variant_id, cost, _ in cursor)
+        return latest
+
+    def name_map(self, catalog: str, ids: Iterable[int] | None = None) -> Dict[int, str]:
+        """``id -> name`` for ``ids`` (or the whole catalog when ``ids`` is ``None``)."""
+        if catalog not in NAME_CATALOGS:
+            raise ValueError(f"Catálogo desconocido: {catalog}")
+        if ids is None:
+            return dict(self._conn.execute(f"SELECT id, name FROM {catalog}"))
+
+        mapping: Dict[int, str] = {}
+        for chunk in _chunks(sorted({int(value) for value in ids})):
+            placeholders = ",".join("?" * len(chunk))
+            mapping.update(self._conn.execute(f"SELECT id, name FROM {catalog} WHERE id IN ({placeholders})", chunk))
+        return mapping
+
+    def variants(
+        self,
+        ids: Iterable[int] | None = None,
+        skus: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Filas de ``variants`` con las columnas de ``dim_variant``.
+
+        Sin filtros devuelve el catálogo completo; con ``ids`` y/o ``skus`` devuelve
+        la unión de ambas búsquedas (ambas usan índice).
+        """
+        columns = "SELECT id, sku, description, cost_net_unit FROM variants"
+        if ids is None and skus is None:
+            rows = self._conn.execute(columns).fetchall()
+        else:
+            rows = []
+            for column, values in (("id", sorted({int(v) for v in ids or ()})), ("sku", sorted(set(skus or ())))):
+                for chunk in _chunks(values):
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(self._conn.execute(f"{columns} WHERE {column} IN ({placeholders})", chunk))
+
+        df = pd.DataFrame(rows, columns=["variant_id", "sku", "variant_description", "cost_net_unit"])
+        return _typed_variants_dim(df.drop_duplicates("variant_id"))
+
+    def variants_with_history(
+        self,
+        ids: Iterable[int] | None = None,
+        skus: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Como ``variants`` pero con una fila por costo vigente (columna ``effective_from``),
+        lista para el join point-in-time del reporte. Las variantes sin historial usan su
+        costo actual desde siempre.
+        """
+        current = self.variants(ids, skus)
+        found = [int(value) for value in current["variant_id"].dropna()]
+        history: List = []
+        for chunk in _chunks(sorted(found)):
+            placeholders = ",".join("?" * len(chunk))
+            history.extend(
+                self._conn.execute(
+                    f"SELECT variant_id, effective_from, cost_net_unit FROM variant_costs "
+                    f"WHERE variant_id IN ({placeholders})",
+                    chunk,
+                )
+            )
+        costs = pd.DataFrame(history, columns=["variant_id", "effective_from", "cost_net_unit"])
+        costs["variant_id"] = costs["variant_id"].astype("Int64")
+
+        without_history = current[~current["variant_id"].isin(costs["variant_id"])].assign(effective_from=0.0)
+        with_history = current.drop(columns="cost_net_unit").merge(costs, on="variant_id", how="inner")
+        return pd.concat([without_history, with_history[without_history.columns]], ignore_index=True)
+
+    def maps_for(self, df_items: pd.DataFrame | None = None) -> CatalogMaps:
+        """
+        Catálogos restringidos a los ids que aparecen en ``df_items`` (líneas normalizadas),
+        con la misma forma que ``get_all_maps``. Sin ``df_items`` devuelve todo. La
+        dimensión de variantes incluye el historial de costos (``effective_from``).
+        """
+        if df_items is None:
+            names = [self.name_map(catalog) for catalog in NAME_CATALOGS]
+            return (*names, self.variants_with_history())
+
+        def _column(name: str) -> pd.Series:
+            return df_items[name] if name in df_items.columns else pd.Series(dtype="object")
+
+        names = [self.name_map(catalog, _distinct_ids(_column(_ID_COLUMNS[catalog]))) for catalog in NAME_CATALOGS]
+        skus = [str(value) for value in _column("variant.code").dropna().unique()]
+        dim_variant = self.variants_with_history(ids=_distinct_ids(_column("variant.id")), skus=skus)
+        return (*names, dim_variant)
+
+
+def refresh_catalog_store(
+    store: CatalogStore,
+    refresh: bool = False,
+    *,
+    lazy_variants: bool = False,
+    concurrency: int = 1,
+    debug: bool = False,
+) -> None:
+    """
+    Refresca en el store solo los catálogos vencidos según ``CATALOG_TTLS``.
+
+    Los datos salen de la caché JSON/Feather de ``catalogs`` si sigue vigente; si no, se
+    revalidan en el momento contra Bsale (ver ``_load_catalog``), para no marcar el store
+    como sincronizado con datos vencidos. El upsert solo reescribe las filas que cambiaron.
+    Con ``lazy_variants`` no se descarga ``/variants``: ver ``ensure_variants``. Cada
+    descarga pide sus páginas de a ``concurrency``.
+    """
+    now = time.time()
+    catalogs = list(NAME_CATALOGS) if lazy_variants else [*NAME_CATALOGS, "variants_dim"]
+    for catalog in catalogs:
+        state = store.sync_state(catalog)
+        if not refresh and state is not None and not state["partial"] and now - state["synced_at"] <= CATALOG_TTLS[catalog]:
+            continue
+        data = _load_catalog(catalog, refresh, concurrency)
+        if data is None:
+            continue
+        # Fecha de la última validación contra Bsale, no la de ahora: si los datos salen de
+        # una caché validada hace horas, el store vence cuando vence esa caché.
+        validated_at = float(_catalog_meta(catalog).get("validated_at", now))
+        if catalog == "variants_dim":
+            changed = store.upsert_variants(data, checked_at=validated_at)
+        else:
+            changed = store.upsert_names(catalog, data)
+        store.mark_synced(catalog, synced_at=validated_at)
+        if debug:
+            print(f"ℹ️ catálogo {catalog}: {changed} filas nuevas o modificadas en {store.path}")
+
+
+def _load_catalog(catalog: str, refresh: bool, concurrency: int = 1):
+    """
+    Datos de ``catalog`` para el store. Una caché vigente se usa tal cual; una vencida se
+    revalida en el momento (petición condicional) y solo con ``304`` se usa la caché.
+    Devuelve ``None`` si la revalidación falla: el store conserva lo que tenía.
+    """
+    is_variants = catalog == "variants_dim"
+    if refresh:
+        if is_variants:
+            return get_variants_dim(refresh=True, concurrency=concurrency)
+        return _NAME_LOADERS[catalog](True, concurrency=concurrency)
+    if _is_stale(catalog) or (is_variants and _catalog_meta(catalog).get("partial")):
+        try:
+            if is_variants:
+                fresh = _refresh_variants_dim(conditional=True, concurrency=concurrency)
+            else:
+                fresh = _refresh_name_map(catalog, conditional=True, concurrency=concurrency)
+        except BsaleAPIError as exc:
+            print(f"⚠️ No se pudo revalidar el catálogo {catalog}: {exc}")
+            return None
+        if fresh is not None:
+            return fresh
+    # Caché vigente o recién validada con 304: el loader la devuelve sin revalidar.
+    if is_variants:
+        return get_variants_dim(concurrency=concurrency)
+    return _NAME_LOADERS[catalog](False, concurrency=concurrency)
+
+
+def ensure_names(store: CatalogStore, df_items: pd.DataFrame, *, concurrency: int = 1) -> int:
+    """
+    Como ``catalogs.complete_name_maps`` pero sobre el store: si un catálogo de nombres no
+    conoce algún id de ``df_items`` se descarga en el momento y se guarda. Devuelve las
+    filas modificadas.
+    """
+    changed = 0
+    for catalog in NAME_CATALOGS:
+        ids = unnamed_ids(df_items, catalog)
+        if ids and ids - store.name_map(catalog, ids).keys():
+            mapping = refresh_name_map_once(catalog, concurrency=concurrency)
+            if mapping:
+                changed += store.upsert_names(catalog, mapping)
+                store.mark_synced(catalog, synced_at=float(_catalog_meta(catalog).get("validated_at", time.time())))
+    return changed
+
+
+def ensure_variants(store: CatalogStore, variant_ids: Iterable, *, concurrency: int = 8) -> int:
+    """
+    Descarga (vía ``get_variants_for``) y guarda las variantes de ``variant_ids`` que
+    faltan en el store o cuya verificación venció según ``CATALOG_TTLS["variants_dim"]``.
+    """
+    wanted = set(_distinct_ids(pd.Series(list(variant_ids), dtype="object")))
+    current = store.checked_variant_ids(wanted, time.time() - CATALOG_TTLS["variants_dim"])
+    missing = sorted(wanted - current)
+    if not missing:
+        return 0
+    fetched = get_variants_for(missing, concurrency=concurrency)
+    changed = store.upsert_variants(fetched[fetched["variant_id"].isin(missing)])
+    if store.sync_state("variants_dim") is None:
+        store.mark_synced("variants_dim", partial=True)
+    return changed
+
+
+def refresh_variant_costs(store: CatalogStore, *, debug: bool = False) -> int:
+    """
+    Refresco nocturno de costos: actualiza variantes y su historial de costos.
+
+    Con ``BSALE_VARIANTS_UPDATED_SINCE_PARAM`` y un sync previo solo se piden las
+    variantes modificadas desde entonces; si no, se recorre ``/variants`` completo y
+    el store detecta qué costos cambiaron. En ambos casos las variantes se agregan
+    también a la caché Feather de ``dim_variant``. Devuelve las filas modificadas.
+    """
+    started = time.time()
+    state = store.sync_state("variant_costs")
+    if VARIANTS_UPDATED_SINCE_PARAM and state is not None:
+        since = int(state["synced_at"]) - UPDATED_SINCE_OVERLAP_SECONDS
+        rows = fetch_bsale_data("variants", {"limit": "50", VARIANTS_UPDATED_SINCE_PARAM: str(since)})
+        fresh = _rows_to_variants_dim(rows)
+        upsert_variants_dim(fresh)
+    else:
+        fresh = get_variants_dim(refresh=True)
+
+    changed = store.upsert_variants(fresh)
+    store.mark_synced("variant_costs", synced_at=started)
+    if debug:
+        print(f"ℹ️ costos de variantes: {len(fresh)} revisadas, {changed} nuevas o modificadas")
+    return changed
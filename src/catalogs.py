@@ -2,13 +2,19 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-from typing import Dict, Iterable, List, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
 
-from .api_client import BsaleAPIError, fetch_bsale_data
+from .api_client import AsyncBsaleClient, BsaleAPIError, fetch_bsale_conditional, fetch_bsale_json
 
 
 CACHE_DIR = os.path.join("data", "cache")
@@ -27,77 +33,223 @@ def _load_cache(name: str):
     return None
 
 
+def _tmp_path(path: str) -> str:
+    # Único por proceso e hilo: varios workers pueden reescribir el mismo archivo a la vez.
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
 def _save_cache(name: str, data) -> None:
-    with open(_cache_path(name), "w", encoding="utf-8") as handle:
+    # Escritura atómica: un refresco en segundo plano no debe dejar lecturas a medias.
+    path = _cache_path(name)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as handle:
         json.dump(data, handle, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# dim_variant se guarda en Feather (Arrow IPC) sin comprimir para poder leerlo con memory map.
+VARIANTS_DIM_PATH = os.path.join(CACHE_DIR, "variants_dim.feather")
+VARIANTS_SCHEMA_VERSION = "1"
+_SCHEMA_VERSION_KEY = b"bsale_schema_version"
+
+VARIANTS_DIM_DTYPES: Dict[str, str] = {
+    "variant_id": "Int64",
+    "sku": "object",
+    "variant_description": "object",
+    "cost_net_unit": "float64",
+}
+
+
+def _typed_variants_dim(df: pd.DataFrame) -> pd.DataFrame:
+    """Reindex to the dim_variant columns and coerce them to ``VARIANTS_DIM_DTYPES``."""
+    df = df.reindex(columns=list(VARIANTS_DIM_DTYPES))
+    return pd.DataFrame(
+        {
+            "variant_id": pd.to_numeric(df["variant_id"], errors="coerce").round().astype("Int64"),
+            "sku": df["sku"].astype(object).where(df["sku"].notna(), ""),
+            "variant_description": df["variant_description"].astype(object).where(
+                df["variant_description"].notna(), ""
+            ),
+            "cost_net_unit": pd.to_numeric(df["cost_net_unit"], errors="coerce").fillna(0.0).astype("float64"),
+        }
+    )
+
+
+def _save_variants_dim(df: pd.DataFrame, fetched_at: float | None = None) -> None:
+    """
+    Write the dimension plus a ``fetched_at`` column (unix of each row's download).
+
+    Rows keep their own ``fetched_at`` when ``df`` has one; otherwise they all get
+    ``fetched_at`` (default: now).
+    """
+    typed = _typed_variants_dim(df)
+    if "fetched_at" in df.columns:
+        typed["fetched_at"] = pd.to_numeric(df["fetched_at"], errors="coerce").fillna(0.0).astype("float64")
+    else:
+        typed["fetched_at"] = float(time.time() if fetched_at is None else fetched_at)
+    table = pa.Table.from_pandas(typed, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_SCHEMA_VERSION_KEY] = VARIANTS_SCHEMA_VERSION.encode("ascii")
+    tmp_path = _tmp_path(VARIANTS_DIM_PATH)
+    feather.write_feather(table.replace_schema_metadata(metadata), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, VARIANTS_DIM_PATH)
+
+# ---------------- Metadata de caché: TTL y validadores HTTP ----------------
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+CATALOG_TTLS: Dict[str, int] = {
+    "document_types": 7 * DAY,
+    "offices": 7 * DAY,
+    "price_lists": DAY,
+    "users": DAY,
+    "variants_dim": 12 * HOUR,
+}
+
+# Pasado este múltiplo del TTL se descarga completo aunque el servidor siga respondiendo 304,
+# porque el ETag/Last-Modified corresponde solo a la primera página del catálogo.
+FULL_REFRESH_FACTOR = 4
+
+CACHE_META_PATH = os.path.join(CACHE_DIR, "_meta.json")
+_META_LOCK = threading.Lock()
+_REFRESH_LOCK = threading.Lock()
+_REFRESH_THREADS: Dict[str, threading.Thread] = {}
+_BACKGROUND_REVALIDATION = True
+
+
+def _load_meta() -> Dict[str, Dict]:
+    if os.path.exists(CACHE_META_PATH):
+        try:
+            with open(CACHE_META_PATH, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except ValueError:
+            pass
+    return {}
+
+
+def _catalog_meta(name: str) -> Dict:
+    meta = _load_meta().get(name)
+    if meta:
+        return meta
+    # Cachés anteriores a la metadata: se usa la fecha del archivo como fecha de descarga.
+    path = VARIANTS_DIM_PATH if name == "variants_dim" and os.path.exists(VARIANTS_DIM_PATH) else _cache_path(name)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return {"fetched_at": mtime, "validated_at": mtime}
+
+
+def _update_meta(name: str, **changes) -> None:
+    with _META_LOCK:
+        meta = _load_meta()
+        entry = meta.get(name) or _catalog_meta(name)
+        entry.update(changes)
+        meta[name] = entry
+        tmp_path = _tmp_path(CACHE_META_PATH)
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, CACHE_META_PATH)
+
+
+def _record_fetch(name: str, validators: Dict[str, str]) -> None:
+    now = time.time()
+    _update_meta(
+        name,
+        fetched_at=now,
+        validated_at=now,
+        etag=validators.get("etag"),
+        last_modified=validators.get("last_modified"),
+        partial=False,
+    )
 
 
-def _fetch_all(
+def _is_stale(name: str) -> bool:
+    return time.time() - float(_catalog_meta(name).get("validated_at", 0)) > CATALOG_TTLS[name]
+
+
+def _fetch_catalog_rows(
+    name: str,
     endpoint: str,
+    fields: str | None,
     *,
-    fields: str | None = None,
-    extra_params: Dict[str, str] | None = None,
-) -> List[Dict]:
+    conditional: bool = False,
+    concurrency: int = 1,
+) -> Optional[Tuple[List[Dict], Dict[str, str]]]:
+    """
+    Fetch a catalog; with ``conditional`` returns ``None`` when Bsale answers 304.
+
+    Pages after the first are requested ``concurrency`` at a time.
+    """
     params: Dict[str, str] = {"limit": "50"}
     if fields:
         params["fields"] = fields
-    if extra_params:
-        params.update(extra_params)
-    return fetch_bsale_data(endpoint, params=params)
 
-# ---------------- Catalog maps: nombres legibles ----------------
+    etag = last_modified = None
+    meta = _catalog_meta(name)
+    if conditional and time.time() - float(meta.get("fetched_at", 0)) < CATALOG_TTLS[name] * FULL_REFRESH_FACTOR:
+        etag, last_modified = meta.get("etag"), meta.get("last_modified")
 
-def get_document_types_map(refresh: bool = False) -> Dict[int, str]:
-    if not refresh:
-        cached = _load_cache("document_types")
-        if cached:
-            try:
-                return {int(k): str(v) if v is not None else "" for k, v in cached.items()}
-            except (ValueError, AttributeError):
-                pass
+    result = fetch_bsale_conditional(
+        endpoint, params, etag=etag, last_modified=last_modified, concurrency=concurrency
+    )
+    if result is None:
+        _update_meta(name, validated_at=time.time())
+    return result
 
-    rows = _fetch_all("document_types", fields="[id,name]")
-    mapping = {
-        int(row["id"]): str(row.get("name", ""))
-        for row in rows
-        if row.get("id") is not None
-    }
-    _save_cache("document_types", {str(k): v for k, v in mapping.items()})
-    return mapping
 
-def get_price_lists_map(refresh: bool = False) -> Dict[int, str]:
-    if not refresh:
-        cached = _load_cache("price_lists")
-        if cached:
-            try:
-                return {int(k): str(v) if v is not None else "" for k, v in cached.items()}
-            except (ValueError, AttributeError):
-                pass
+def _run_refresh(name: str, refresher: Callable[[], object]) -> None:
+    try:
+        refresher()
+    except BsaleAPIError as exc:
+        print(f"⚠️ No se pudo revalidar el catálogo {name}: {exc}")
+
+
+def set_background_revalidation(enabled: bool) -> None:
+    """
+    Turn stale-while-revalidate on or off for this process.
 
-    rows = _fetch_all("price_lists", fields="[id,name]")
-    mapping = {
+    Backfill workers turn it off: the parent already revalidated before forking, and
+    N workers would otherwise each start the same full crawl.
+    """
+    global _BACKGROUND_REVALIDATION
+    _BACKGROUND_REVALIDATION = enabled
+
+
+def _revalidate_in_background(name: str, refresher: Callable[[], object]) -> None:
+    """Stale-while-revalidate: el llamador usa la caché y el refresco corre en un hilo."""
+    if not _BACKGROUND_REVALIDATION:
+        return
+    with _REFRESH_LOCK:
+        running = _REFRESH_THREADS.get(name)
+        if running is not None and running.is_alive():
+            return
+        # Hilo daemon: el reporte no espera un recorrido completo al salir. Si el proceso
+        # termina antes, la caché anterior sigue intacta (las escrituras son atómicas) y
+        # la siguiente ejecución vuelve a revalidar.
+        thread = threading.Thread(
+            target=_run_refresh, args=(name, refresher), name=f"refresh-{name}", daemon=True
+        )
+        _REFRESH_THREADS[name] = thread
+    thread.start()
+
+
+def wait_for_refreshes(timeout: float | None = None) -> None:
+    """Block until every background catalog revalidation has finished."""
+    with _REFRESH_LOCK:
+        threads = list(_REFRESH_THREADS.values())
+    for thread in threads:
+        thread.join(timeout)
+
+# ---------------- Builders: filas de la API -> mapas / DataFrames ----------------
+
+def _rows_to_name_map(rows: Iterable[Dict]) -> Dict[int, str]:
+    return {
         int(row["id"]): str(row.get("name", ""))
         for row in rows
         if row.get("id") is not None
     }
-    _save_cache("price_lists", {str(k): v for k, v in mapping.items()})
-    return mapping
 
-def get_users_map(refresh: bool = False) -> Dict[int, str]:
-    """
-    Algunas cuentas no exponen 'name' y traen 'firstName'/'lastName'.
-    Construimos full_name = firstName + lastName.
-    """
-    cache_name = "users"
-    if not refresh:
-        cached = _load_cache(cache_name)
-        if cached:
-            try:
-                return {int(k): str(v) if v is not None else "" for k, v in cached.items()}
-            except (ValueError, AttributeError):
-                pass
 
-    rows = _fetch_all("users")
+def _rows_to_users_map(rows: Iterable[Dict]) -> Dict[int, str]:
     m: Dict[int, str] = {}
     for r in rows:
         uid = r.get("id")
@@ -109,55 +261,14 @@ def get_users_map(refresh: bool = False) -> Dict[int, str]:
             ln = r.get("lastName") or ""
             full = f"{fn} {ln}".strip()
         m[int(uid)] = full or ""
-    _save_cache(cache_name, {str(k): v for k, v in m.items()})
     return m
 
-def get_offices_map(refresh: bool = False) -> Dict[int, str]:
-    if not refresh:
-        cached = _load_cache("offices")
-        if cached:
-            try:
-                return {int(k): str(v) if v is not None else "" for k, v in cached.items()}
-            except (ValueError, AttributeError):
-                pass
 
-    rows = _fetch_all("offices", fields="[id,name]")
-    mapping = {
-        int(row["id"]): str(row.get("name", ""))
-        for row in rows
-        if row.get("id") is not None
-    }
-    _save_cache("offices", {str(k): v for k, v in mapping.items()})
-    return mapping
+def _empty_variants_dim() -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in VARIANTS_DIM_DTYPES.items()})
 
-# ---------------- dim_variant con costos ----------------
-
-def get_variants_dim(refresh: bool = False) -> pd.DataFrame:
-    """
-    Devuelve un DataFrame con variantes (SKU) y costo unitario neto si está disponible.
-    Intentamos varios nombres de campo de costo (dependen de la cuenta):
-    - 'cost', 'costPrice', 'netCost', 'lastPurchasePrice', 'averageCost'
-    Si no hay costo disponible, deja 0.0
-    """
-    cache_name = "variants_dim"
-    cache_path = _cache_path(cache_name)
-    if not refresh and os.path.exists(cache_path):
-        try:
-            return pd.read_json(cache_path, orient="records", dtype=False)
-        except ValueError:
-            pass
-
-    try:
-        rows = _fetch_all("variants")
-    except BsaleAPIError:
-        # Endpoint no disponible: devolvemos dataframe vacío con costos 0.
-        df_fallback = pd.DataFrame(
-            {"variant_id": pd.Series(dtype="float"), "sku": pd.Series(dtype="object"),
-             "variant_description": pd.Series(dtype="object"), "cost_net_unit": pd.Series(dtype="float")}
-        )
-        df_fallback.to_json(cache_path, orient="records", force_ascii=False)
-        return df_fallback
 
+def _rows_to_variants_dim(rows: List[Dict]) -> pd.DataFrame:
     df = pd.json_normalize(rows, sep=".")
     if df.empty:
         df["id"] = pd.Series(dtype="float")
@@ -194,14 +305,367 @@ def get_variants_dim(refresh: bool = False) -> pd.DataFrame:
         }
     )
 
-    result.to_json(cache_path, orient="records", force_ascii=False)
+    return _typed_variants_dim(result)
+
+
+def _cached_name_map(name: str) -> Dict[int, str] | None:
+    cached = _load_cache(name)
+    if cached:
+        try:
+            return {int(k): str(v) if v is not None else "" for k, v in cached.items()}
+        except (ValueError, AttributeError):
+            pass
+    return None
+
+
+def _read_variants_feather(*, with_fetched_at: bool = False) -> pd.DataFrame | None:
+    try:
+        table = feather.read_table(VARIANTS_DIM_PATH, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    version = (table.schema.metadata or {}).get(_SCHEMA_VERSION_KEY, b"").decode("ascii")
+    if version != VARIANTS_SCHEMA_VERSION:
+        # Esquema de otra versión: se trata como caché ausente y se vuelve a descargar.
+        return None
+    raw = table.to_pandas()
+    dim = _typed_variants_dim(raw)
+    if with_fetched_at:
+        # Archivos anteriores a la columna: sin fecha, cada fila cuenta como vencida.
+        fetched_at = raw["fetched_at"] if "fetched_at" in raw.columns else 0.0
+        dim["fetched_at"] = pd.to_numeric(fetched_at, errors="coerce")
+        dim["fetched_at"] = dim["fetched_at"].fillna(0.0).astype("float64")
+    return dim
+
+
+def _cached_variants_dim(*, with_fetched_at: bool = False) -> pd.DataFrame | None:
+    """Cached dimension; ``with_fetched_at`` adds each row's download time (see ``get_variants_for``)."""
+    if os.path.exists(VARIANTS_DIM_PATH):
+        return _read_variants_feather(with_fetched_at=with_fetched_at)
+
+    # Caché JSON de versiones anteriores: se lee una vez y se migra a Feather.
+    legacy_path = _cache_path("variants_dim")
+    if os.path.exists(legacy_path):
+        try:
+            cached = pd.read_json(legacy_path, orient="records", dtype=False)
+        except ValueError:
+            return None
+        cached = _typed_variants_dim(cached)
+        fetched_at = float(_catalog_meta("variants_dim").get("fetched_at", 0.0))
+        _save_variants_dim(cached, fetched_at)
+        return cached.assign(fetched_at=fetched_at) if with_fetched_at else cached
+    return None
+
+
+# ---------------- Catalog maps: nombres legibles ----------------
+
+# nombre de caché / endpoint -> (fields, builder)
+_NAME_CATALOGS: Dict[str, Tuple[str | None, Callable[[Iterable[Dict]], Dict[int, str]]]] = {
+    "document_types": ("[id,name]", _rows_to_name_map),
+    "price_lists": ("[id,name]", _rows_to_name_map),
+    "users": (None, _rows_to_users_map),
+    "offices": ("[id,name]", _rows_to_name_map),
+}
+
+
+def _refresh_name_map(name: str, *, conditional: bool = False, concurrency: int = 1) -> Dict[int, str] | None:
+    fields, builder = _NAME_CATALOGS[name]
+    fetched = _fetch_catalog_rows(name, name, fields, conditional=conditional, concurrency=concurrency)
+    if fetched is None:
+        return None
+    rows, validators = fetched
+    mapping = builder(rows)
+    _save_cache(name, {str(k): v for k, v in mapping.items()})
+    _record_fetch(name, validators)
+    return mapping
+
+
+def _get_name_map(name: str, refresh: bool, concurrency: int = 1) -> Dict[int, str]:
+    if not refresh:
+        cached = _cached_name_map(name)
+        if cached is not None:
+            if _is_stale(name):
+                _revalidate_in_background(
+                    name, lambda: _refresh_name_map(name, conditional=True, concurrency=concurrency)
+                )
+            return cached
+
+    return _refresh_name_map(name, concurrency=concurrency)
+
+
+def get_document_types_map(refresh: bool = False, *, concurrency: int = 1) -> Dict[int, str]:
+    return _get_name_map("document_types", refresh, concurrency)
+
+def get_price_lists_map(refresh: bool = False, *, concurrency: int = 1) -> Dict[int, str]:
+    return _get_name_map("price_lists", refresh, concurrency)
+
+def get_users_map(refresh: bool = False, *, concurrency: int = 1) -> Dict[int, str]:
+    """
+    Algunas cuentas no exponen 'name' y traen 'firstName'/'lastName'.
+    Construimos full_name = firstName + lastName.
+    """
+    return _get_name_map("users", refresh, concurrency)
+
+def get_offices_map(refresh: bool = False, *, concurrency: int = 1) -> Dict[int, str]:
+    return _get_name_map("offices", refresh, concurrency)
+
+# Columnas de las líneas normalizadas con el id de cada catálogo de nombres y, si la
+# relación vino expandida, su nombre.
+NAME_ID_COLUMNS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "document_types": ("doc.documentTypeId", ("doc.document_type.name", "doc.documentType.name")),
+    "users": ("doc.user.id", ("doc.user.name",)),
+    "price_lists": ("doc.priceList.id", ("doc.priceList.name",)),
+    "offices": ("doc.office.id", ("doc.office.name",)),
+}
+
+_FORCED_NAME_MAPS: Dict[str, Dict[int, str]] = {}
+_FORCED_LOCK = threading.Lock()
+
+
+def unnamed_ids(df_items: pd.DataFrame, name: str) -> set:
+    """Ids of catalog ``name`` on lines without an expanded name: the report needs the catalog for them."""
+    id_column, name_columns = NAME_ID_COLUMNS[name]
+    if df_items.empty or id_column not in df_items.columns:
+        return set()
+    ids = pd.to_numeric(df_items[id_column], errors="coerce")
+    for column in name_columns:
+        if column in df_items.columns:
+            names = df_items[column]
+            ids = ids.where(names.isna() | (names.astype(str) == ""))
+    return {int(value) for value in ids.dropna().unique()}
+
+
+def refresh_name_map_once(name: str, *, concurrency: int = 1) -> Dict[int, str]:
+    """
+    Descarga síncrona de un catálogo de nombres, a lo más una vez por proceso.
+
+    La usan quienes encuentran ids que la caché no conoce (una sucursal, lista de precios,
+    tipo de documento o usuario creado después de la última descarga). Un id que Bsale
+    tampoco conoce no vuelve a disparar descargas: las siguientes llamadas devuelven la
+    misma descarga. Si falla se avisa y se sigue con la caché.
+    """
+    with _FORCED_LOCK:
+        if name not in _FORCED_NAME_MAPS:
+            try:
+                _FORCED_NAME_MAPS[name] = _refresh_name_map(name, concurrency=concurrency)
+            except BsaleAPIError as exc:
+                print(f"⚠️ No se pudo refrescar el catálogo {name}: {exc}")
+                _FORCED_NAME_MAPS[name] = {}
+        return _FORCED_NAME_MAPS[name]
+
+
+# ---------------- dim_variant con costos ----------------
+
+def get_variants_dim(refresh: bool = False, *, concurrency: int = 1) -> pd.DataFrame:
+    """
+    Devuelve un DataFrame con variantes (SKU) y costo unitario neto si está disponible.
+    Intentamos varios nombres de campo de costo (dependen de la cuenta):
+    - 'cost', 'costPrice', 'netCost', 'lastPurchasePrice', 'averageCost'
+    Si no hay costo disponible, deja 0.0
+    """
+    if not refresh and not _catalog_meta("variants_dim").get("partial"):
+        cached = _cached_variants_dim()
+        if cached is not None:
+            if _is_stale("variants_dim"):
+                _revalidate_in_background(
+                    "variants_dim", lambda: _refresh_variants_dim(conditional=True, concurrency=concurrency)
+                )
+            return cached
+
+    return _refresh_variants_dim(concurrency=concurrency)
+
+
+def _refresh_variants_dim(*, conditional: bool = False, concurrency: int = 1) -> pd.DataFrame | None:
+    try:
+        fetched = _fetch_catalog_rows(
+            "variants_dim", "variants", None, conditional=conditional, concurrency=concurrency
+        )
+    except BsaleAPIError:
+        if conditional:
+            raise
+        # Endpoint no disponible: devolvemos dataframe vacío con costos 0.
+        df_fallback = _empty_variants_dim()
+        _save_variants_dim(df_fallback)
+        _record_fetch("variants_dim", {})
+        return df_fallback
+
+    if fetched is None:
+        return None
+    rows, validators = fetched
+    result = _rows_to_variants_dim(rows)
+    _save_variants_dim(result)
+    _record_fetch("variants_dim", validators)
     return result
 
-def get_all_maps(refresh: bool = False) -> Tuple[Dict[int,str], Dict[int,str], Dict[int,str], Dict[int,str], pd.DataFrame]:
-    return (
-        get_document_types_map(refresh),
-        get_users_map(refresh),
-        get_price_lists_map(refresh),
-        get_offices_map(refresh),
-        get_variants_dim(refresh),
+# ---------------- dim_variant bajo demanda ----------------
+
+_VARIANTS_LOCK = threading.Lock()
+
+
+def _fetch_variants_by_id(variant_ids: List[int], concurrency: int) -> List[Dict]:
+    def _fetch(variant_id: int) -> Dict | None:
+        try:
+            payload = fetch_bsale_json(f"variants/{variant_id}")
+        except BsaleAPIError:
+            # Variante eliminada o sin permisos: el reporte la deja con costo 0.
+            return None
+        return payload if isinstance(payload, dict) and payload.get("id") is not None else None
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        return [row for row in executor.map(_fetch, variant_ids) if row is not None]
+
+
+def get_variants_for(variant_ids: Iterable, *, concurrency: int = 8) -> pd.DataFrame:
+    """
+    Dimensión de variantes "lazy": solo descarga las variantes pedidas que faltan en caché
+    o cuya fila venció (``CATALOG_TTLS["variants_dim"]`` desde su ``fetched_at``).
+
+    Las variantes se piden en paralelo a ``/variants/{id}.json`` y se agregan al store
+    persistente ``data/cache/variants_dim.feather``. Si ese store no proviene de una
+    descarga completa queda marcado como parcial, y ``get_variants_dim`` lo ignora.
+    Devuelve el store completo (incluye variantes de ejecuciones anteriores) con la
+    columna ``fetched_at``.
+    """
+    ids = {int(value) for value in pd.to_numeric(pd.Series(list(variant_ids), dtype="object"), errors="coerce").dropna()}
+    now = time.time()
+    with _VARIANTS_LOCK:
+        cached = _cached_variants_dim(with_fetched_at=True)
+        base = cached if cached is not None else _empty_variants_dim().assign(fetched_at=pd.Series(dtype="float64"))
+        current = base["fetched_at"] >= now - CATALOG_TTLS["variants_dim"]
+        known = set(base.loc[current, "variant_id"].dropna().astype(int))
+        missing = sorted(ids - known)
+        if not missing:
+            return base
+
+        # Una variante vencida que ya no se puede descargar conserva su fila anterior.
+        fresh = _rows_to_variants_dim(_fetch_variants_by_id(missing, concurrency)).assign(fetched_at=now)
+        merged = _merge_into_variants_dim(base, fresh)
+        if cached is None:
+            _update_meta("variants_dim", fetched_at=0.0, validated_at=0.0, partial=True)
+    return merged
+
+
+def _merge_into_variants_dim(base: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    # Quien llama debe tener _VARIANTS_LOCK: la lectura y la escritura van juntas.
+    if "fetched_at" not in fresh.columns:
+        fresh = fresh.assign(fetched_at=time.time())
+    merged = pd.concat([base, fresh], ignore_index=True).drop_duplicates("variant_id", keep="last")
+    merged = merged.reset_index(drop=True)
+    _save_variants_dim(merged)
+    return merged
+
+
+def upsert_variants_dim(fresh: pd.DataFrame) -> pd.DataFrame:
+    """Upsert ``fresh`` rows (by ``variant_id``) into the cached dimension and return it."""
+    with _VARIANTS_LOCK:
+        cached = _cached_variants_dim(with_fetched_at=True)
+        base = cached if cached is not None else _empty_variants_dim().assign(fetched_at=pd.Series(dtype="float64"))
+        return _merge_into_variants_dim(base, fresh)
+
+
+CatalogMaps = Tuple[Dict[int, str], Dict[int, str], Dict[int, str], Dict[int, str], pd.DataFrame]
+
+# Páginas simultáneas por catálogo en get_all_maps (el token bucket de api_client sigue limitando la tasa).
+CATALOG_CONCURRENCY = 4
+
+
+def _cached_or_empty_variants_dim() -> pd.DataFrame:
+    cached = _cached_variants_dim()
+    return cached if cached is not None else _empty_variants_dim()
+
+
+def get_all_maps(
+    refresh: bool = False,
+    *,
+    lazy_variants: bool = False,
+    concurrency: int = CATALOG_CONCURRENCY,
+) -> CatalogMaps:
+    """
+    Load the five catalogs concurrently so cold-cache crawls overlap their network waits.
+
+    Each catalog download (or background revalidation) also fetches its pages
+    ``concurrency`` at a time. With ``lazy_variants`` the variant dimension is whatever
+    is already cached (no ``/variants`` crawl); callers complete it with ``get_variants_for``.
+    """
+    loaders = (
+        get_document_types_map,
+        get_users_map,
+        get_price_lists_map,
+        get_offices_map,
+        (lambda refresh, concurrency: _cached_or_empty_variants_dim()) if lazy_variants else get_variants_dim,
+    )
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        futures = [executor.submit(loader, refresh, concurrency=concurrency) for loader in loaders]
+        doc_types, users, price_lists, offices, variants = (future.result() for future in futures)
+    return doc_types, users, price_lists, offices, variants
+
+
+def complete_name_maps(maps: CatalogMaps, df_items: pd.DataFrame, *, concurrency: int = 1) -> CatalogMaps:
+    """
+    ``maps`` with every name catalog able to name the lines of ``df_items``.
+
+    Profiles that do not expand office, user, price list or document type (``auto``,
+    ``minimal``) rely on the catalogs for those names; a cached catalog that misses one
+    of the ids is downloaded again (see ``refresh_name_map_once``) instead of leaving
+    the column blank.
+    """
+    names = list(maps[:4])
+    for position, name in enumerate(("document_types", "users", "price_lists", "offices")):
+        if unnamed_ids(df_items, name) - names[position].keys():
+            names[position] = {**names[position], **refresh_name_map_once(name, concurrency=concurrency)}
+    return (*names, maps[4])
+
+
+async def aget_all_maps(
+    client: AsyncBsaleClient,
+    refresh: bool = False,
+    *,
+    lazy_variants: bool = False,
+) -> CatalogMaps:
+    """Same result as ``get_all_maps`` but fetching missing catalogs concurrently on ``client``."""
+
+    async def _name_map(name: str, builder, fields: str | None) -> Dict[int, str]:
+        if not refresh:
+            cached = _cached_name_map(name)
+            if cached is not None:
+                if _is_stale(name):
+                    _revalidate_in_background(
+                        name, lambda: _refresh_name_map(name, conditional=True, concurrency=CATALOG_CONCURRENCY)
+                    )
+                return cached
+        params: Dict[str, str] = {"limit": "50"}
+        if fields:
+            params["fields"] = fields
+        mapping = builder(await client.fetch_all(name, params))
+        _save_cache(name, {str(k): v for k, v in mapping.items()})
+        _record_fetch(name, {})
+        return mapping
+
+    async def _variants() -> pd.DataFrame:
+        if lazy_variants:
+            return _cached_or_empty_variants_dim()
+        if not refresh and not _catalog_meta("variants_dim").get("partial"):
+            cached = _cached_variants_dim()
+            if cached is not None:
+                if _is_stale("variants_dim"):
+                    _revalidate_in_background(
+                        "variants_dim", lambda: _refresh_variants_dim(conditional=True, concurrency=CATALOG_CONCURRENCY)
+                    )
+                return cached
+        try:
+            rows = await client.fetch_all("variants", {"limit": "50"})
+        except BsaleAPIError:
+            result = _empty_variants_dim()
+        else:
+            result = _rows_to_variants_dim(rows)
+        _save_variants_dim(result)
+        _record_fetch("variants_dim", {})
+        return result
+
+    doc_types, users, price_lists, offices, variants = await asyncio.gather(
+        _name_map("document_types", _rows_to_name_map, "[id,name]"),
+        _name_map("users", _rows_to_users_map, None),
+        _name_map("price_lists", _rows_to_name_map, "[id,name]"),
+        _name_map("offices", _rows_to_name_map, "[id,name]"),
+        _variants(),
     )
+    return doc_types, users, price_lists, offices, variants
@@ -0,0 +1,196 @@
+"""Document-level extraction helpers built on top of the generic API client."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from .api_client import _extract_items, _log_debug, fetch_bsale_data, fetch_bsale_json
+
+
+DETAILS_PAGE_LIMIT = 50
+
+
+def _truncated_details(documents: Iterable[Dict]) -> Dict[int, Tuple[int, int]]:
+    """Map document id -> (items already embedded, total count) for truncated ``details``."""
+    pending: Dict[int, Tuple[int, int]] = {}
+    for doc in documents:
+        details = doc.get("details")
+        if doc.get("id") is None or not isinstance(details, dict):
+            continue
+        items = details.get("items") or []
+        count = details.get("count")
+        if count is not None and int(count) > len(items):
+            doc_id = int(doc["id"])
+            embedded, _ = pending.get(doc_id, (len(items), 0))
+            pending[doc_id] = (min(embedded, len(items)), int(count))
+    return pending
+
+
+def complete_document_details(
+    documents: List[Dict],
+    *,
+    concurrency: int = 4,
+    limit: int = DETAILS_PAGE_LIMIT,
+) -> int:
+    """
+    Completa ``details.items`` de los documentos truncados por ``expand=details``.
+
+    Detecta ``details.count > len(details.items)``, deduplica por ``id`` y pide todas las
+    páginas faltantes de ``/documents/{id}/details.json`` de todos los documentos
+    afectados en un único pool de hilos. Modifica los documentos in place y devuelve
+    cuántos documentos se completaron.
+    """
+    pending = _truncated_details(documents)
+    if not pending:
+        return 0
+
+    tasks = [
+        (doc_id, offset)
+        for doc_id, (embedded, count) in pending.items()
+        for offset in range(embedded, count, limit)
+    ]
+    _log_debug(f"ℹ️ completando detalles: {len(pending)} documentos, {len(tasks)} páginas")
+
+    def _fetch(task: Tuple[int, int]) -> List[Dict]:
+        doc_id, offset = task
+        payload = fetch_bsale_json(
+            f"documents/{doc_id}/details",
+            {"limit": limit, "offset": offset, "expand": "variant"},
+        )
+        return _extract_items(payload)
+
+    extra: Dict[int, List[Dict]] = {doc_id: [] for doc_id in pending}
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        for (doc_id, _), items in zip(tasks, executor.map(_fetch, tasks)):
+            extra[doc_id].extend(items)
+
+    for doc in documents:
+        if doc.get("id") is None or int(doc["id"]) not in extra:
+            continue
+        details = doc["details"]
+        embedded = details.get("items") or []
+        seen = {item.get("id") for item in embedded if item.get("id") is not None}
+        merged = list(embedded)
+        for item in extra[int(doc["id"])]:
+            item_id = item.get("id")
+            if item_id is not None and item_id in seen:
+                continue
+            seen.add(item_id)
+            merged.append(item)
+        details["items"] = merged
+
+    return len(pending)
+
+
+# ---------------- Sharding por ventanas de tiempo ----------------
+
+SHARD_SECONDS = {"day": 86400, "hour": 3600}
+MIN_SHARD_SECONDS = 3600
+
+
+def plan_shards(start_unix: int, end_unix: int, shard_seconds: int) -> List[Tuple[int, int]]:
+    """Split the inclusive range ``[start_unix, end_unix]`` into consecutive windows."""
+    shards: List[Tuple[int, int]] = []
+    cursor = start_unix
+    while cursor <= end_unix:
+        shard_end = min(cursor + shard_seconds - 1, end_unix)
+        shards.append((cursor, shard_end))
+        cursor = shard_end + 1
+    return shards
+
+
+def with_emission_window(params: Dict[str, str], window: Tuple[int, int]) -> Dict[str, str]:
+    query = dict(params)
+    query["emissiondaterange"] = f"[{window[0]},{window[1]}]"
+    return query
+
+
+def count_documents(params: Dict[str, str], window: Tuple[int, int]) -> int:
+    """Cheap probe (``limit=1``, ``fields=[id]``, sin expand) que devuelve ``count`` de la ventana."""
+    query = {
+        key: value
+        for key, value in with_emission_window(params, window).items()
+        if key not in ("expand", "fields", "limit", "offset")
+    }
+    query.update({"limit": 1, "offset": 0, "fields": "[id]"})
+    payload = fetch_bsale_json("documents", query)
+    return int(payload.get("count") or 0) if isinstance(payload, dict) else 0
+
+
+def _resolve_shards(
+    params: Dict[str, str],
+    shards: List[Tuple[int, int]],
+    executor: ThreadPoolExecutor,
+    split_threshold: int,
+) -> List[Tuple[int, int]]:
+    """Halve every shard whose ``count`` exceeds the threshold until it fits or hits MIN_SHARD_SECONDS."""
+    resolved = list(shards)
+    settled: set = set()
+    while True:
+        to_probe = [
+            shard
+            for shard in resolved
+            if shard not in settled and shard[1] - shard[0] + 1 > MIN_SHARD_SECONDS
+        ]
+        counts = dict(zip(to_probe, executor.map(lambda shard: count_documents(params, shard), to_probe)))
+        oversized = {shard for shard, count in counts.items() if count > split_threshold}
+        settled.update(shard for shard in to_probe if shard not in oversized)
+        if not oversized:
+            return resolved
+
+        next_round: List[Tuple[int, int]] = []
+        for shard in resolved:
+            if shard not in oversized:
+                next_round.append(shard)
+                continue
+            half = max((shard[1] - shard[0] + 1) // 2, MIN_SHARD_SECONDS)
+            _log_debug(f"ℹ️ shard {shard} con {counts[shard]} documentos: se divide")
+            next_round.extend(plan_shards(shard[0], shard[1], half))
+        resolved = next_round
+
+
+def fetch_sharded_documents(
+    params: Dict[str, str],
+    start_unix: int,
+    end_unix: int,
+    *,
+    shard: str = "day",
+    max_workers: int = 4,
+    split_threshold: int = 5000,
+    page_concurrency: int = 1,
+) -> List[Dict]:
+    """
+    Descarga ``/documents`` de ``[start_unix, end_unix]`` dividiendo el rango en shards.
+
+    Cada shard (día u hora) se pagina de forma independiente con su propio
+    ``emissiondaterange``, evitando offsets profundos. Los shards corren en paralelo;
+    si ``split_threshold > 0`` se sondea el ``count`` de cada uno y los que lo superan
+    se parten por la mitad (hasta una hora). El resultado conserva el orden de los
+    shards y se deduplica por ``id`` de documento.
+    """
+    shards = plan_shards(start_unix, end_unix, SHARD_SECONDS[shard])
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        if split_threshold > 0:
+            shards = _resolve_shards(params, shards, executor, split_threshold)
+        _log_debug(f"ℹ️ {len(shards)} shards de documentos")
+        results = executor.map(
+            lambda window: fetch_bsale_data(
+                "documents",
+                params=with_emission_window(params, window),
+                concurrency=page_concurrency,
+            ),
+            shards,
+        )
+
+        documents: List[Dict] = []
+        seen: set = set()
+        for shard_documents in results:
+            for doc in shard_documents:
+                doc_id = doc.get("id")
+                if doc_id is not None:
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                documents.append(doc)
+    return documents
@@ -0,0 +1,345 @@
+"""Local stand-in for the Bsale API, serving synthetic data for load tests and benchmarks.
+
+Uso (desde la raíz del repo)::
+
+    python -m src.fake_server --port 8765 --documents 50000 --latency-ms 40 --rate-429 0.02
+
+y luego ``BSALE_BASE_URL=http://127.0.0.1:8765/v1`` (cualquier ``BSALE_TOKEN`` sirve).
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .synthetic import (
+    DOCUMENT_TYPE_IDS,
+    N_OFFICES,
+    N_PRICE_LISTS,
+    N_USERS,
+    document_at,
+    emission_date_of,
+    variant_cost,
+)
+
+
+API_PREFIX = "/v1"
+MAX_LIMIT = 50
+
+# Relaciones de /documents que Bsale solo embebe con expand; sin él quedan como {"href", "id"}.
+DOCUMENT_RELATIONS = ("client", "office", "user", "coin", "priceList", "details")
+RELATION_ENDPOINTS = {"client": "clients", "office": "offices", "user": "users", "coin": "coins", "priceList": "price_lists"}
+
+
+@dataclass(frozen=True)
+class FakeBsaleConfig:
+    """Escala de los datos sintéticos y fallas inyectadas."""
+
+    documents: int = 10_000
+    lines_per_document: int = 4
+    variants: int = 2000
+    start_unix: int = 1704067200
+    days: int = 30
+    seed: int = 0
+    # Ítems de detalle embebidos con expand=details; el resto solo vía /documents/{id}/details.
+    details_embed_limit: int = 50
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_429: float = 0.0
+    error_rate: float = 0.0
+    retry_after: float = 1.0
+
+
+class FakeBsale:
+    """Catálogos y documentos sintéticos, más la lógica de paginado/filtros de la API."""
+
+    def __init__(self, config: FakeBsaleConfig) -> None:
+        self.config = config
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._ranges: "OrderedDict[Tuple[int, int], List[int]]" = OrderedDict()
+        self._ranges_lock = threading.Lock()
+        self.catalogs: Dict[str, List[Dict]] = {
+            "document_types": [{"id": type_id, "name": f"Tipo {type_id}"} for type_id in DOCUMENT_TYPE_IDS],
+            "users": [{"id": user_id, "firstName": "Vendedor", "lastName": str(user_id)} for user_id in range(1, N_USERS + 1)],
+            "price_lists": [{"id": list_id, "name": f"Lista {list_id}"} for list_id in range(1, N_PRICE_LISTS + 1)],
+            "offices": [{"id": office_id, "name": f"Sucursal {office_id}"} for office_id in range(1, N_OFFICES + 1)],
+            "variants": [
+                {
+                    "id": variant_id,
+                    "code": f"SKU-{variant_id:05d}",
+                    "description": f"Producto sintético {variant_id}",
+                    "cost": variant_cost(variant_id),
+                }
+                for variant_id in range(1, config.variants + 1)
+            ],
+        }
+
+    def count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def document(self, index: int) -> Dict:
+        config = self.config
+        return document_at(
+            index,
+            lines_per_document=config.lines_per_document,
+            n_variants=config.variants,
+            start_unix=config.start_unix,
+            days=config.days,
+            seed=config.seed,
+        )
+
+    def document_indexes(self, emission_range: Optional[Tuple[int, int]]) -> List[int] | range:
+        """Índices de documentos (orden por id) con ``emissionDate`` dentro del rango."""
+        config = self.config
+        if emission_range is None:
+            return range(config.documents)
+        with self._ranges_lock:
+            cached = self._ranges.get(emission_range)
+            if cached is not None:
+                self._ranges.move_to_end(emission_range)
+                return cached
+
+        start, end = emission_range
+        # Los documentos ciclan por días: se filtra por posición en el ciclo y no documento a documento.
+        days = max(config.days, 1)
+        slots = {
+            slot
+            for slot in range(days)
+            if start <= emission_date_of(slot, start_unix=config.start_unix, days=days) <= end
+        }
+        indexes = [index for index in range(config.documents) if index % days in slots]
+        with self._ranges_lock:
+            self._ranges[emission_range] = indexes
+            while len(self._ranges) > 64:
+                self._ranges.popitem(last=False)
+        return indexes
+
+
+def _page(href: str, items: List[Dict], total: int, limit: int, offset: int) -> Dict:
+    payload: Dict[str, Any] = {"href": href, "count": total, "limit": limit, "offset": offset, "items": items}
+    if offset + limit < total:
+        payload["next"] = f"{href}?limit={limit}&offset={offset + limit}"
+    return payload
+
+
+def _parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    return [field.strip() for field in value.strip("[]").split(",") if field.strip()]
+
+
+def _parse_range(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not value:
+        return None
+    start, end = value.strip("[]").split(",")
+    return int(start), int(end)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeBsaleServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - firma de BaseHTTPRequestHandler
+        pass
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802 - nombre fijado por BaseHTTPRequestHandler
+        fake = self.server.fake
+        config = fake.config
+        if config.latency_ms or config.jitter_ms:
+            time.sleep(max(config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms), 0.0) / 1000)
+
+        roll = random.random()
+        if roll < config.rate_429:
+            fake.count("429")
+            self._send(429, {"error": "Too Many Requests"}, {"Retry-After": f"{config.retry_after:g}"})
+            return
+        if roll < config.rate_429 + config.error_rate:
+            fake.count("5xx")
+            self._send(503, {"error": "Service Unavailable"})
+            return
+
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        if not path.startswith(f"{API_PREFIX}/") or not path.endswith(".json"):
+            self._send(404, {"error": f"Ruta desconocida: {path}"})
+            return
+        resource = path[len(API_PREFIX) + 1 : -len(".json")]
+        fake.count(re.sub(r"/\d+", "/{id}", resource))
+        try:
+            status, payload = self._route(resource, query)
+        except ValueError as exc:
+            status, payload = 400, {"error": str(exc)}
+        self._send(status, payload)
+
+    def _route(self, resource: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        fake = self.server.fake
+        href = f"http://{self.headers.get('Host', 'localhost')}{API_PREFIX}/{resource}.json"
+        limit = min(int(query.get("limit", 25)), MAX_LIMIT)
+        offset = int(query.get("offset", 0))
+        fields = _parse_fields(query.get("fields"))
+
+        if resource == "documents":
+            expand = {part.strip() for part in query.get("expand", "").strip("[]").split(",") if part.strip()}
+            indexes = fake.document_indexes(_parse_range(query.get("emissiondaterange")))
+            items = [self._render_document(fake.document(index), expand, fields) for index in indexes[offset : offset + limit]]
+            return 200, _page(href, items, len(indexes), limit, offset)
+
+        match = re.fullmatch(r"documents/(\d+)/details", resource)
+        if match:
+            index = int(match.group(1)) - 1
+            if not 0 <= index < fake.config.documents:
+                return 404, {"error": "Documento no encontrado"}
+            details = fake.document(index)["details"]["items"]
+            return 200, _page(href, details[offset : offset + limit], len(details), limit, offset)
+
+        match = re.fullmatch(r"(variants|documents)/(\d+)", resource)
+        if match:
+            kind, item_id = match.group(1), int(match.group(2))
+            if kind == "documents":
+                if not 0 < item_id <= fake.config.documents:
+                    return 404, {"error": "Documento no encontrado"}
+                return 200, self._render_document(fake.document(item_id - 1), set(), fields)
+            if not 0 < item_id <= len(fake.catalogs["variants"]):
+                return 404, {"error": "Variante no encontrada"}
+            return 200, _project(fake.catalogs["variants"][item_id - 1], fields)
+
+        rows = fake.catalogs.get(resource)
+        if rows is None:
+            return 404, {"error": f"Recurso desconocido: {resource}"}
+        items = [_project(row, fields) for row in rows[offset : offset + limit]]
+        return 200, _page(href, items, len(rows), limit, offset)
+
+    def _render_document(self, document: Dict, expand: set, fields: Optional[List[str]]) -> Dict:
+        base = f"http://{self.headers.get('Host', 'localhost')}{API_PREFIX}"
+        doc_id = document["id"]
+        for relation in DOCUMENT_RELATIONS:
+            value = document[relation]
+            if relation == "details":
+                items = value["items"]
+                embed = self.server.fake.config.details_embed_limit
+                if "details" in expand:
+                    document["details"] = {
+                        "href": f"{base}/documents/{doc_id}/details.json",
+                        "count": len(items),
+                        "limit": embed,
+                        "offset": 0,
+                        "items": items[:embed],
+                    }
+                else:
+                    document["details"] = {"href": f"{base}/documents/{doc_id}/details.json"}
+            elif relation not in expand:
+                endpoint = RELATION_ENDPOINTS[relation]
+                document[relation] = {"href": f"{base}/{endpoint}/{value['id']}.json", "id": str(value["id"])}
+
+        if "document_type" in expand:
+            type_id = document["documentTypeId"]
+            document["document_type"] = {"id": type_id, "name": f"Tipo {type_id}"}
+        return _project(document, fields)
+
+
+def _project(row: Dict, fields: Optional[List[str]]) -> Dict:
+    if not fields:
+        return row
+    # Las relaciones expandidas se conservan aunque no estén en fields, como en Bsale.
+    keep = set(fields) | {"document_type"}
+    return {key: value for key, value in row.items() if key in keep}
+
+
+class FakeBsaleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], fake: FakeBsale) -> None:
+        super().__init__(address, _Handler)
+        self.fake = fake
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+
+def start_fake_server(
+    config: FakeBsaleConfig | None = None,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> FakeBsaleServer:
+    """Start the server on a background thread (``port=0`` picks a free port); stop it with ``shutdown()``."""
+    server = FakeBsaleServer((host, port), FakeBsale(config or FakeBsaleConfig()))
+    threading.Thread(target=server.serve_forever, name="fake-bsale", daemon=True).start()
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de Bsale con datos sintéticos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--documents", type=int, default=FakeBsaleConfig.documents, help="Documentos generados")
+    parser.add_argument("--lines-per-document", type=int, default=FakeBsaleConfig.lines_per_document)
+    parser.add_argument("--variants", type=int, default=FakeBsaleConfig.variants)
+    parser.add_argument("--start", type=str, default="2024-01-01", help="Primer día de emisión (YYYY-MM-DD, UTC)")
+    parser.add_argument("--days", type=int, default=FakeBsaleConfig.days, help="Días sobre los que se reparten los documentos")
+    parser.add_argument("--seed", type=int, default=FakeBsaleConfig.seed)
+    parser.add_argument("--details-embed-limit", type=int, default=FakeBsaleConfig.details_embed_limit)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia media por respuesta")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variación uniforme de la latencia")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fracción de respuestas 429 (con Retry-After)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Segundos de Retry-After en los 429")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    start_day = time.strptime(args.start, "%Y-%m-%d")
+    config = FakeBsaleConfig(
+        documents=args.documents,
+        lines_per_document=args.lines_per_document,
+        variants=args.variants,
+        start_unix=calendar.timegm(start_day),
+        days=args.days,
+        seed=args.seed,
+        details_embed_limit=args.details_embed_limit,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+    )
+    server = FakeBsaleServer((args.host, args.port), FakeBsale(config))
+    print(f"▶ Bsale falso en {server.base_url} ({config.documents} documentos, {config.variants} variantes)")
+    print(f"   BSALE_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"ℹ️ peticiones: {dict(server.fake.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Named /documents fetch profiles: which relations to expand and which fields to request."""
+
+from __future__ import annotations
+
+import argparse
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .utils import EXPECTED_COLUMNS
+
+
+FETCH_PROFILES = ("auto", "minimal", "full")
+
+# Cabecera que todo perfil pide: identifica el documento y trae los ítems de detalle.
+_BASE_FIELDS: Tuple[str, ...] = ("id", "number", "emissionDate", "documentTypeId", "trackingNumber", "token", "details")
+
+# Sin expand Bsale devuelve estas relaciones como {"href", "id"}: el id basta para que
+# los catálogos (o el store SQLite) resuelvan el nombre.
+_ID_RELATIONS: Tuple[str, ...] = ("office", "user", "priceList")
+
+# Columnas del reporte que solo salen de una relación expandida (no hay catálogo que las resuelva).
+COLUMN_RELATIONS: Dict[str, str] = {
+    "Nombre Cliente": "client",
+    "Cliente RUT": "client",
+    "Moneda": "coin",
+}
+
+_FULL_EXPAND: Tuple[str, ...] = ("details", "client", "office", "user", "coin", "priceList")
+_FULL_FIELDS: Tuple[str, ...] = (
+    "id", "number", "emissionDate", "documentTypeId", "trackingNumber", "token",
+    "netAmount", "taxAmount", "totalAmount", "totalDiscount",
+    "client", "office", "user", "coin", "priceList", "details",
+)
+
+
+class FetchProfile(NamedTuple):
+    name: str
+    expand: Tuple[str, ...]
+    fields: Tuple[str, ...]
+
+    def params(self, include_document_type: bool = True) -> Dict[str, str]:
+        """``expand``/``fields`` query params; ``document_type`` solo se expande en ``full``."""
+        expand = list(self.expand)
+        if include_document_type and self.name == "full":
+            expand.append("document_type")
+        return {"expand": ",".join(expand), "fields": f"[{','.join(self.fields)}]"}
+
+
+def parse_columns(text: str) -> List[str]:
+    """``argparse`` type for ``--columns``: comma-separated report columns, in output order."""
+    columns = [part.strip() for part in text.split(",") if part.strip()]
+    unknown = [column for column in columns if column not in EXPECTED_COLUMNS]
+    if unknown or not columns:
+        raise argparse.ArgumentTypeError(
+            f"Columnas desconocidas: {', '.join(unknown) or '(ninguna)'}. Disponibles: {', '.join(EXPECTED_COLUMNS)}"
+        )
+    return columns
+
+
+def resolve_fetch_profile(name: str = "auto", columns: Optional[Sequence[str]] = None) -> FetchProfile:
+    """
+    Resolve a profile name to the relations and fields to request.
+
+    ``full`` keeps the historical query (every relation expanded). ``minimal`` expands
+    only ``details`` and asks for the ids of office, user and price list, leaving their
+    names to the catalog joins; client and currency columns stay empty (``Moneda``
+    falls back to CLP). ``auto`` is ``minimal`` plus the relations that the requested
+    ``columns`` (all report columns by default) actually need.
+    """
+    if name == "full":
+        return FetchProfile("full", _FULL_EXPAND, _FULL_FIELDS)
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Perfil de descarga desconocido: {name}")
+
+    needed: List[str] = []
+    if name == "auto":
+        for column in columns or EXPECTED_COLUMNS:
+            relation = COLUMN_RELATIONS.get(column)
+            if relation is not None and relation not in needed:
+                needed.append(relation)
+    return FetchProfile(name, ("details", *needed), (*_BASE_FIELDS, *_ID_RELATIONS, *needed))
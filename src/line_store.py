@@ -0,0 +1,90 @@
+"""Parquet dataset of normalized line items, partitioned by emission day."""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, timedelta
+from typing import List
+
+import pandas as pd
+
+
+LINES_DIR = os.path.join("data", "lines")
+PARTITION_COLUMN = "emission_day"
+
+
+def _partition_dir(day: str, root: str = LINES_DIR) -> str:
+    return os.path.join(root, f"{PARTITION_COLUMN}={day}")
+
+
+def _emission_day(df_items: pd.DataFrame) -> pd.Series:
+    # Mismo criterio que "Fecha de Emisión" en el reporte (unix en UTC).
+    dt = pd.to_datetime(pd.to_numeric(df_items["doc.emissionDate"], errors="coerce"), unit="s", errors="coerce")
+    return dt.dt.strftime("%Y-%m-%d")
+
+
+def _to_scalar(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _prepare_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parquet necesita un tipo por columna: las columnas ``object`` que solo traen números
+    (p. ej. ids con nulos) pasan a numéricas y el resto a texto (listas/dicts como JSON).
+    Los textos con forma de número (SKU "00123") se mantienen como texto.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != "O":
+            continue
+        values = df[col].map(_to_scalar)
+        non_null = values.dropna()
+        if non_null.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)).all():
+            df[col] = pd.to_numeric(values, errors="coerce")
+        else:
+            df[col] = values.astype("string")
+    return df
+
+
+def write_line_items(df_items: pd.DataFrame, root: str = LINES_DIR) -> List[str]:
+    """
+    Persist normalized line items, replacing every emission-day partition present in ``df_items``.
+
+    Callers must pass complete days (the CLI always fetches whole days), since a
+    partition is overwritten rather than merged.
+    """
+    if df_items.empty or "doc.emissionDate" not in df_items.columns:
+        return []
+
+    days = _emission_day(df_items)
+    written: List[str] = []
+    for day, part in _prepare_for_parquet(df_items).groupby(days, sort=True):
+        target_dir = _partition_dir(str(day), root)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, "part-0.parquet")
+        tmp_path = f"{target}.tmp"
+        part.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, target)
+        written.append(str(day))
+    return written
+
+
+def read_line_items(since: str, until: str, root: str = LINES_DIR) -> pd.DataFrame:
+    """Load the line items of every stored emission day in ``[since, until]`` (YYYY-MM-DD)."""
+    start = date.fromisoformat(since)
+    end = date.fromisoformat(until)
+
+    frames: List[pd.DataFrame] = []
+    current = start
+    while current <= end:
+        path = os.path.join(_partition_dir(current.isoformat(), root), "part-0.parquet")
+        if os.path.exists(path):
+            frames.append(pd.read_parquet(path))
+        current += timedelta(days=1)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -3,12 +3,47 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import cProfile
+import itertools
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime
-from typing import Dict, List, Tuple
-
-from .api_client import BsaleAPIError, fetch_bsale_data
-from .utils import build_reporte_ventas, ensure_data_dir
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from . import api_client
+from .api_client import (
+    AsyncBsaleClient,
+    BsaleAPIError,
+    configure_client,
+    configure_response_cache,
+    fetch_bsale_data,
+    iter_bsale_pages,
+)
+from .backfill import run_backfill
+from .catalog_store import (
+    CATALOG_DB_PATH,
+    CatalogStore,
+    ensure_names,
+    ensure_variants,
+    refresh_catalog_store,
+    refresh_variant_costs,
+)
+from .catalogs import CatalogMaps, aget_all_maps, complete_name_maps, get_all_maps, get_variants_for
+from .documents import SHARD_SECONDS, complete_document_details, fetch_sharded_documents
+from .fetch_profiles import FETCH_PROFILES, parse_columns, resolve_fetch_profile
+from .line_store import read_line_items, write_line_items
+from .metrics import METRICS
+from .sync import sync_documents
+from .utils import (
+    build_reporte_ventas_from_items,
+    build_reporte_ventas_stream,
+    ensure_data_dir,
+    normalize_documents,
+)
 
 
 VERSION = "main v5"
@@ -20,15 +55,163 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--since", type=str, help="Fecha inicio YYYY-MM-DD", default=None)
     parser.add_argument("--until", type=str, help="Fecha fin YYYY-MM-DD", default=None)
     parser.add_argument("--limit", type=int, default=50, help="Tamaño de página (máx 50 en Bsale)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Páginas de /documents a descargar en paralelo (1 = secuencial)",
+    )
+    parser.add_argument(
+        "--shard",
+        choices=["none", *SHARD_SECONDS],
+        default="none",
+        help="Divide el rango en ventanas (día u hora) que se descargan en paralelo",
+    )
+    parser.add_argument(
+        "--shard-workers",
+        type=int,
+        default=4,
+        help="Shards descargados en paralelo con --shard",
+    )
+    parser.add_argument(
+        "--shard-threshold",
+        type=int,
+        default=5000,
+        help="Documentos por shard sobre los que se vuelve a dividir (0 = no sondear)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Backfill multiproceso: reparte shards diarios en N procesos (0 = desactivado)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Descarga documentos y catálogos a la vez con el cliente asyncio",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Procesa /documents por lotes y agrega filas al CSV sin acumular todo en memoria",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=2000,
+        help="Documentos por lote en modo --stream",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Sincroniza solo documentos nuevos contra el store local (data/store) y reporta desde él",
+    )
+    parser.add_argument(
+        "--lazy-variants",
+        action="store_true",
+        help="No descarga todo /variants: solo las variantes presentes en los documentos que falten en caché",
+    )
+    parser.add_argument(
+        "--save-lines",
+        action="store_true",
+        help="Guarda las líneas normalizadas en data/lines (Parquet particionado por día de emisión)",
+    )
+    parser.add_argument(
+        "--from-lines",
+        action="store_true",
+        help="Regenera el reporte desde data/lines sin consultar la API de documentos",
+    )
+    parser.add_argument(
+        "--catalog-db",
+        nargs="?",
+        const=CATALOG_DB_PATH,
+        default=None,
+        help=f"Usa un store SQLite de catálogos compartido (por defecto {CATALOG_DB_PATH}) y solo consulta los ids del reporte",
+    )
+    parser.add_argument(
+        "--refresh-costs",
+        action="store_true",
+        help="Solo actualiza costos de variantes y su historial en el store de catálogos (refresco nocturno)",
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Guarda las respuestas crudas de la API en data/cache/responses (gzip, LRU acotado)",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Sirve todas las peticiones desde data/cache/responses sin consultar Bsale",
+    )
+    parser.add_argument(
+        "--fetch-profile",
+        choices=FETCH_PROFILES,
+        default="auto",
+        help="Relaciones y campos a pedir a /documents: auto (según --columns), minimal (solo ids y detalle) o full",
+    )
+    parser.add_argument(
+        "--columns",
+        type=parse_columns,
+        default=None,
+        help="Columnas del reporte separadas por coma (por defecto todas); con --fetch-profile auto definen qué se descarga",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        default=None,
+        help="Escribe métricas por etapa (JSON, o texto Prometheus si termina en .prom/.txt)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Guarda un perfil cProfile de la ejecución en esta ruta (.pstats)",
+    )
     parser.add_argument("--out", type=str, help="Ruta del CSV de salida", default=None)
     parser.add_argument("--debug", action="store_true", help="Imprime información adicional")
-    return parser.parse_args()
+    args = parser.parse_args()
+    _reject_incompatible(parser, args)
+    return args
+
+
+# (opción, opción incompatible, motivo): combinaciones que un modo ignoraría en silencio.
+_INCOMPATIBLE_OPTIONS: Tuple[Tuple[str, str, str], ...] = (
+    ("from_lines", "stream", "--stream descarga documentos de la API"),
+    ("from_lines", "workers", "--workers descarga documentos de la API"),
+    ("save_lines", "stream", "--stream no acumula las líneas de un día para escribir su partición"),
+    ("save_lines", "workers", "los workers de --workers no guardan líneas"),
+    ("shard", "stream", "--stream pagina un único rango"),
+    ("shard", "use_async", "--async pagina un único rango"),
+    ("incremental", "stream", "--stream no pasa por el store de documentos"),
+    ("incremental", "workers", "los workers de --workers no pasan por el store de documentos"),
+    ("use_async", "stream", "--stream pagina con el cliente síncrono"),
+    ("use_async", "incremental", "--incremental descarga cada tramo con el cliente síncrono"),
+    ("use_async", "workers", "los workers de --workers usan el cliente síncrono"),
+)
+
+
+def _flag(dest: str) -> str:
+    return "--async" if dest == "use_async" else "--" + dest.replace("_", "-")
+
+
+def _is_set(args: argparse.Namespace, dest: str) -> bool:
+    return getattr(args, dest) not in (None, False, 0, "none")
+
+
+def _reject_incompatible(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    for option, other, reason in _INCOMPATIBLE_OPTIONS:
+        if _is_set(args, option) and _is_set(args, other):
+            parser.error(f"{_flag(option)} no se puede combinar con {_flag(other)}: {reason}")
+
+
+def _day_range(since: str | None, until: str | None) -> Tuple[str, str]:
+    today = datetime.today().strftime("%Y-%m-%d")
+    return since or until or today, until or since or today
 
 
 def _to_unix_day_bounds(since: str | None, until: str | None) -> Tuple[int, int]:
-    today = datetime.today()
-    start_source = since or until or today.strftime("%Y-%m-%d")
-    end_source = until or since or today.strftime("%Y-%m-%d")
+    start_source, end_source = _day_range(since, until)
 
     start_date = datetime.fromisoformat(start_source)
     end_date = datetime.fromisoformat(end_source)
@@ -38,28 +221,48 @@ def _to_unix_day_bounds(since: str | None, until: str | None) -> Tuple[int, int]
     return int(start.timestamp()), int(end.timestamp())
 
 
-def _build_params(args: argparse.Namespace, include_document_type: bool = True) -> Dict[str, str]:
-    expand_parts = ["details", "client", "office", "user", "coin", "priceList"]
-    if include_document_type:
-        expand_parts.append("document_type")
+def _fetch_profile_name(args: argparse.Namespace) -> str:
+    # El store de --incremental y data/lines se reutilizan en ejecuciones con otras
+    # columnas o perfiles: lo que se persiste siempre se descarga completo.
+    if args.incremental or args.save_lines:
+        return "full"
+    return args.fetch_profile
+
 
+def _build_params(
+    args: argparse.Namespace,
+    include_document_type: bool = True,
+    window: Tuple[int, int] | None = None,
+) -> Dict[str, str]:
+    profile = resolve_fetch_profile(_fetch_profile_name(args), args.columns)
     params: Dict[str, str] = {
         "limit": str(args.limit),
-        "expand": ",".join(expand_parts),
-        "fields": (
-            "[id,number,emissionDate,documentTypeId,trackingNumber,token," \
-            "netAmount,taxAmount,totalAmount,totalDiscount," \
-            "client,office,user,coin,priceList,details]"
-        ),
+        **profile.params(include_document_type=include_document_type),
     }
 
-    if args.since or args.until:
+    if window is not None:
+        params["emissiondaterange"] = f"[{window[0]},{window[1]}]"
+    elif args.since or args.until:
         start_unix, end_unix = _to_unix_day_bounds(args.since, args.until)
         params["emissiondaterange"] = f"[{start_unix},{end_unix}]"
 
     return params
 
 
+async def _fetch_async(
+    args: argparse.Namespace,
+    params: Dict[str, str],
+) -> Tuple[List[Dict], CatalogMaps]:
+    async with AsyncBsaleClient(concurrency=max(args.concurrency, 1)) as client:
+        if args.catalog_db:
+            # Los catálogos salen del store SQLite, que se refresca en paralelo.
+            return await client.fetch_all("documents", params), None
+        return await asyncio.gather(
+            client.fetch_all("documents", params),
+            aget_all_maps(client, lazy_variants=args.lazy_variants),
+        )
+
+
 def inspect_one(documents: List[Dict]) -> None:
     if not documents:
         print("ℹ️ Sin documentos para inspeccionar")
@@ -81,44 +284,322 @@ def inspect_one(documents: List[Dict]) -> None:
             print(f"   claves variant: {list(variant.keys())}")
 
 
-def main() -> None:
-    args = parse_args()
+def _is_expand_document_type_error(exc: BsaleAPIError) -> bool:
+    return "document_type" in str(exc) and "expand" in str(exc)
 
-    ensure_data_dir(DATA_DIR)
 
-    if args.debug:
-        print("▶ Ejecutando", VERSION)
+def _complete_details(args: argparse.Namespace, documents: List[Dict]) -> List[Dict]:
+    completed = complete_document_details(documents, concurrency=max(args.concurrency, 4))
+    if args.debug and completed:
+        print(f"ℹ️ detalles completados en {completed} documentos truncados")
+    return documents
 
-    params = _build_params(args, include_document_type=True)
 
-    if args.debug and "emissiondaterange" in params:
-        print(f"   emissiondaterange={params['emissiondaterange']}")
+def _fetch_window(
+    args: argparse.Namespace,
+    include_document_type: bool,
+    window: Tuple[int, int] | None,
+) -> List[Dict]:
+    params = _build_params(args, include_document_type=include_document_type, window=window)
+    if args.shard == "none" or "emissiondaterange" not in params:
+        return fetch_bsale_data("documents", params=params, concurrency=args.concurrency)
+
+    start_unix, end_unix = window or _to_unix_day_bounds(args.since, args.until)
+    return fetch_sharded_documents(
+        params,
+        start_unix,
+        end_unix,
+        shard=args.shard,
+        max_workers=args.shard_workers,
+        split_threshold=args.shard_threshold,
+        page_concurrency=args.concurrency,
+    )
 
+
+def _fetch_documents(args: argparse.Namespace, window: Tuple[int, int] | None = None) -> List[Dict]:
+    try:
+        documents = _fetch_window(args, True, window)
+    except BsaleAPIError as exc:
+        if not _is_expand_document_type_error(exc):
+            raise
+        if args.debug:
+            print("⚠️ expand=document_type no soportado, reintentando sin esa relación")
+        documents = _fetch_window(args, False, window)
+    return _complete_details(args, documents)
+
+
+def _fetch_documents_and_maps(
+    args: argparse.Namespace,
+    params: Dict[str, str],
+) -> Tuple[List[Dict], CatalogMaps | None]:
+    if not args.use_async:
+        return _fetch_documents(args), None
     try:
-        documents = fetch_bsale_data("documents", params=params)
+        documents, maps = asyncio.run(_fetch_async(args, params))
     except BsaleAPIError as exc:
-        if "document_type" in str(exc) and "expand" in str(exc):
+        if not _is_expand_document_type_error(exc):
+            raise
+        if args.debug:
+            print("⚠️ expand=document_type no soportado, reintentando sin esa relación")
+        documents, maps = asyncio.run(_fetch_async(args, _build_params(args, include_document_type=False)))
+    return _complete_details(args, documents), maps
+
+
+def _resolve_out_path(args: argparse.Namespace) -> str:
+    if args.out:
+        return args.out
+    since = args.since or "full"
+    until = args.until or "full"
+    filename = f"reporte_ventas_{since}_{until}.csv"
+    return os.path.join(DATA_DIR, filename)
+
+
+def _maps_resolver(
+    args: argparse.Namespace,
+    maps: CatalogMaps | None,
+    store: CatalogStore | None = None,
+) -> Callable[[pd.DataFrame], CatalogMaps]:
+    """
+    Catálogos para un conjunto de líneas: ids del store SQLite, variantes bajo demanda y
+    nombres que la caché aún no conoce.
+    """
+    concurrency = max(args.concurrency, 4)
+
+    def resolve(df_items: pd.DataFrame) -> CatalogMaps:
+        variant_ids = None
+        if args.lazy_variants and "variant.id" in df_items.columns:
+            variant_ids = df_items["variant.id"].dropna().unique()
+        if store is not None:
+            ensure_names(store, df_items, concurrency=concurrency)
+            if variant_ids is not None:
+                ensure_variants(store, variant_ids, concurrency=concurrency)
+            return store.maps_for(df_items)
+        resolved = complete_name_maps(maps, df_items, concurrency=concurrency)
+        if variant_ids is not None:
+            return (*resolved[:4], get_variants_for(variant_ids, concurrency=concurrency))
+        return resolved
+
+    return resolve
+
+
+def _timed_pages(pages: Iterator[List[Dict]]) -> Iterator[List[Dict]]:
+    """Cuenta en ``fetch_documents`` solo la espera de cada página, no su procesamiento."""
+    while True:
+        with METRICS.stage("fetch_documents"):
+            page = next(pages, None)
+        if page is None:
+            return
+        yield page
+
+
+def _run_stream(
+    args: argparse.Namespace,
+    params: Dict[str, str],
+    out_path: str,
+    maps_future: Future | None,
+) -> None:
+    def _open_pages(query: Dict[str, str]):
+        pages = iter_bsale_pages("documents", params=query, concurrency=args.concurrency)
+        # La primera página se pide aquí para detectar errores de expand antes de escribir.
+        first = next(pages, [])
+        return first, pages
+
+    with METRICS.stage("fetch_documents"):
+        try:
+            first, pages = _open_pages(params)
+        except BsaleAPIError as exc:
+            if not _is_expand_document_type_error(exc):
+                raise
             if args.debug:
                 print("⚠️ expand=document_type no soportado, reintentando sin esa relación")
-            params = _build_params(args, include_document_type=False)
-            documents = fetch_bsale_data("documents", params=params)
-        else:
-            raise
+            first, pages = _open_pages(_build_params(args, include_document_type=False))
 
     if args.debug:
-        print(f"ℹ️ documents: {len(documents)}")
-        inspect_one(documents)
+        inspect_one(first)
+
+    completed_pages = _timed_pages(_complete_details(args, page) for page in itertools.chain([first], pages))
+    with METRICS.stage("catalogs_wait"):
+        maps = maps_future.result() if maps_future is not None else None
+    if args.catalog_db:
+        # Cada lote consulta en el store solo los ids de sus líneas.
+        with CatalogStore(args.catalog_db) as store:
+            build_reporte_ventas_stream(
+                completed_pages,
+                out_path,
+                chunk_size=args.chunk_size,
+                columns=args.columns,
+                maps_for=_maps_resolver(args, None, store),
+            )
+    else:
+        if args.lazy_variants and maps is None:
+            maps = get_all_maps(False, lazy_variants=True, concurrency=max(args.concurrency, 4))
+        build_reporte_ventas_stream(
+            completed_pages,
+            out_path,
+            maps=maps,
+            chunk_size=args.chunk_size,
+            columns=args.columns,
+            maps_for=_maps_resolver(args, maps) if maps is not None else None,
+        )
+    print(f"✅ Reporte generado: {out_path}")
+
 
-    out_path = args.out
-    if not out_path:
-        since = args.since or "full"
-        until = args.until or "full"
-        filename = f"reporte_ventas_{since}_{until}.csv"
-        out_path = os.path.join(DATA_DIR, filename)
+def _run_backfill(args: argparse.Namespace, params: Dict[str, str], out_path: str) -> None:
+    start_unix, end_unix = _to_unix_day_bounds(args.since, args.until)
+    shard = "day" if args.shard == "none" else args.shard
+
+    def run(query: Dict[str, str]) -> None:
+        run_backfill(
+            query,
+            start_unix,
+            end_unix,
+            out_path,
+            workers=args.workers,
+            concurrency=args.concurrency,
+            shard=shard,
+            catalog_db=args.catalog_db,
+            lazy_variants=args.lazy_variants,
+            columns=args.columns,
+            debug=args.debug,
+        )
 
-    build_reporte_ventas(documents, out_path)
+    try:
+        run(params)
+    except BsaleAPIError as exc:
+        if not _is_expand_document_type_error(exc):
+            raise
+        if args.debug:
+            print("⚠️ expand=document_type no soportado, reintentando sin esa relación")
+        run(_build_params(args, include_document_type=False))
     print(f"✅ Reporte generado: {out_path}")
 
 
+def _run_report(
+    args: argparse.Namespace,
+    params: Dict[str, str],
+    out_path: str,
+    maps_future: Future | None,
+) -> None:
+    if args.stream:
+        _run_stream(args, params, out_path, maps_future)
+        return
+
+    maps = None
+    if args.from_lines:
+        since, until = _day_range(args.since, args.until)
+        df_items = read_line_items(since, until)
+        if args.debug:
+            print(f"ℹ️ líneas desde data/lines: {len(df_items)}")
+    else:
+        if args.incremental:
+            start_unix, end_unix = _to_unix_day_bounds(args.since, args.until)
+            with METRICS.stage("fetch_documents"):
+                documents = sync_documents(
+                    start_unix,
+                    end_unix,
+                    lambda start, end: _fetch_documents(args, window=(start, end)),
+                    debug=args.debug,
+                )
+        else:
+            with METRICS.stage("fetch_documents"):
+                documents, maps = _fetch_documents_and_maps(args, params)
+
+        if args.debug:
+            print(f"ℹ️ documents: {len(documents)}")
+            inspect_one(documents)
+
+        with METRICS.stage("normalize"):
+            df_items = normalize_documents(documents) if documents else pd.DataFrame()
+        METRICS.inc("rows_normalized_total", len(df_items))
+        if args.save_lines:
+            days = write_line_items(df_items)
+            if args.debug:
+                print(f"ℹ️ líneas guardadas en data/lines para {len(days)} días")
+
+    if maps is None and maps_future is not None:
+        # Solo cuenta la espera: la carga de catálogos corre en paralelo con la descarga.
+        with METRICS.stage("catalogs_wait"):
+            maps = maps_future.result()
+
+    if args.catalog_db:
+        with CatalogStore(args.catalog_db) as store:
+            maps = _maps_resolver(args, maps, store)(df_items)
+    elif maps is not None:
+        maps = _maps_resolver(args, maps)(df_items)
+
+    build_reporte_ventas_from_items(df_items, out_path, maps=maps, columns=args.columns)
+    print(f"✅ Reporte generado: {out_path}")
+
+
+def _refresh_catalog_db(args: argparse.Namespace) -> None:
+    with CatalogStore(args.catalog_db) as store:
+        refresh_catalog_store(
+            store, lazy_variants=args.lazy_variants, concurrency=max(args.concurrency, 4), debug=args.debug
+        )
+
+
+def main() -> None:
+    args = parse_args()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        _main(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"ℹ️ perfil cProfile guardado en {args.profile} (python -m pstats {args.profile})")
+        if args.metrics_out:
+            METRICS.derive_ratio("join_hits_total", "join_lookups_total", "join_hit_rate")
+            METRICS.write(args.metrics_out)
+            print(f"ℹ️ métricas guardadas en {args.metrics_out}")
+
+
+def _main(args: argparse.Namespace) -> None:
+    ensure_data_dir(DATA_DIR)
+
+    if args.debug:
+        print("▶ Ejecutando", VERSION)
+
+    if args.response_cache or args.replay:
+        configure_response_cache(replay=args.replay)
+
+    if args.refresh_costs:
+        with CatalogStore(args.catalog_db or CATALOG_DB_PATH) as store:
+            changed = refresh_variant_costs(store, debug=args.debug)
+        print(f"✅ Costos de variantes actualizados: {changed} variantes nuevas o modificadas")
+        return
+
+    if args.concurrency > api_client.CLIENT_CONFIG.pool_maxsize:
+        # Un pool menor que la concurrencia obliga a abrir conexiones TLS nuevas.
+        configure_client(replace(api_client.CLIENT_CONFIG, pool_maxsize=args.concurrency))
+
+    params = _build_params(args, include_document_type=True)
+
+    if args.debug:
+        print(f"   perfil {_fetch_profile_name(args)}: expand={params['expand']} fields={params['fields']}")
+    if args.debug and "emissiondaterange" in params:
+        print(f"   emissiondaterange={params['emissiondaterange']}")
+
+    out_path = _resolve_out_path(args)
+
+    if args.workers > 0:
+        _run_backfill(args, params, out_path)
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as catalog_executor:
+        # Los catálogos no dependen de los documentos: se cargan mientras se descargan.
+        if args.catalog_db:
+            maps_future = catalog_executor.submit(_refresh_catalog_db, args)
+        elif args.use_async:
+            maps_future = None
+        else:
+            maps_future = catalog_executor.submit(
+                get_all_maps, False, lazy_variants=args.lazy_variants, concurrency=max(args.concurrency, 4)
+            )
+        _run_report(args, params, out_path, maps_future)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,184 @@
+"""Process-wide pipeline metrics: stage timers, counters, gauges and latency histograms."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Límites superiores (segundos) del histograma de latencia por request.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_SUFFIXES = (".prom", ".txt")
+
+
+def _key(name: str, labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{label}="{value}"' for label, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _split_key(key: str) -> Tuple[str, str]:
+    name, brace, labels = key.partition("{")
+    return name, labels.rstrip("}") if brace else ""
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            running += count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "sum": round(self.sum, 6), "count": running}
+
+
+class Metrics:
+    """
+    Registro de métricas thread-safe.
+
+    ``stage`` acumula segundos por etapa (una etapa puede repetirse, p. ej. por lote
+    en ``--stream``), ``inc`` suma contadores, ``set`` fija gauges y ``observe``
+    alimenta histogramas de latencia.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.stages: Dict[str, float] = {}
+            self.counters: Dict[str, float] = {}
+            self.gauges: Dict[str, float] = {}
+            self.histograms: Dict[str, _Histogram] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def merge(self, snapshot: Dict) -> None:
+        """Add a ``snapshot()`` taken in another process (counters, stages and histograms add up)."""
+        with self._lock:
+            for name, seconds in snapshot["stages"].items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(snapshot["gauges"])
+            for name, (buckets, counts, total) in snapshot["histograms"].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = _Histogram(tuple(buckets))
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+
+    def derive_ratio(self, numerator: str, denominator: str, gauge: str) -> None:
+        """Set ``gauge`` to ``numerator / denominator`` for every label set of two counters."""
+        with self._lock:
+            for key, total in list(self.counters.items()):
+                name, labels = _split_key(key)
+                if name != denominator or not total:
+                    continue
+                hits = self.counters.get(f"{numerator}{{{labels}}}" if labels else numerator, 0)
+                self.gauges[f"{gauge}{{{labels}}}" if labels else gauge] = hits / total
+
+    def snapshot(self) -> Dict:
+        """Picklable raw state, for ``merge`` in a parent process."""
+        with self._lock:
+            return {
+                "stages": dict(self.stages),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: (list(hist.buckets), list(hist.counts), hist.sum) for name, hist in self.histograms.items()
+                },
+            }
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_s": round(time.time() - self.started_at, 4),
+                "stages_s": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+                "gauges": {key: round(value, 6) for key, value in self.gauges.items()},
+                "histograms": {name: hist.to_dict() for name, hist in self.histograms.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "bsale_report") -> str:
+        """Render in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines: List[str] = []
+
+        def _series(name: str, labels: str, value: float) -> None:
+            lines.append(f"{prefix}_{name}{{{labels}}} {value}" if labels else f"{prefix}_{name} {value}")
+
+        lines.append(f"# TYPE {prefix}_stage_seconds gauge")
+        for stage, seconds in data["stages_s"].items():
+            _series("stage_seconds", f'stage="{stage}"', seconds)
+
+        typed = set()
+        for kind, values in (("counter", data["counters"]), ("gauge", data["gauges"])):
+            for key, value in sorted(values.items()):
+                name, labels = _split_key(key)
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}_{name} {kind}")
+                    typed.add(name)
+                _series(name, labels, value)
+
+        for name, hist in data["histograms"].items():
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for bound, count in hist["buckets"].items():
+                _series(f"{name}_bucket", f'le="{bound}"', count)
+            _series(f"{name}_sum", "", hist["sum"])
+            _series(f"{name}_count", "", hist["count"])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write JSON, or Prometheus text when ``path`` ends in ``.prom`` / ``.txt``."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            if path.lower().endswith(PROMETHEUS_SUFFIXES):
+                handle.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), handle, ensure_ascii=False, indent=2)
+
+
+METRICS = Metrics()
@@ -0,0 +1,161 @@
+"""Content-addressed on-disk cache of raw Bsale API responses (gzip, LRU-bounded)."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+RESPONSE_CACHE_DIR = os.path.join("data", "cache", "responses")
+DEFAULT_MAX_BYTES = int(float(os.getenv("BSALE_RESPONSE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+# Fuera de --replay una respuesta sin ventana de fechas cerrada se reutiliza a lo sumo este tiempo.
+DEFAULT_TTL_SECONDS = float(os.getenv("BSALE_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+# Al superar el máximo se expulsan las respuestas menos usadas hasta quedar en esta fracción.
+EVICT_TO_FRACTION = 0.9
+
+_SUFFIX = ".json.gz"
+
+ResponseCacheSettings = Tuple[str, int, bool, float]
+
+
+def cache_key(url: str, query: Dict[str, Any], account: str = "") -> str:
+    """
+    SHA-256 of the URL and its normalized query (values as text, keys sorted, ``None`` dropped).
+
+    ``account`` separates responses of different tokens that share a URL.
+    """
+    params = {str(key): str(value) for key, value in query.items() if value is not None}
+    material = json.dumps({"account": account, "url": url, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _window_end(query: Dict[str, Any]) -> Optional[int]:
+    """End (unix) of an ``emissiondaterange=[start,end]`` query, ``None`` without one."""
+    value = query.get("emissiondaterange")
+    if value is None:
+        return None
+    try:
+        return int(str(value).strip("[]").split(",")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class ResponseCache:
+    """
+    Respuestas JSON crudas guardadas como ``<root>/<2 hex>/<sha256>.json.gz``.
+
+    La fecha de modificación de cada archivo es la de la grabación y la de acceso se
+    renueva en cada lectura y sirve de orden LRU; cuando el tamaño total supera
+    ``max_bytes`` se borran las menos usadas. Con ``replay`` toda respuesta grabada
+    vale y un fallo de caché es un error en vez de ir a la red. Sin ``replay`` la
+    caché no debe congelar datos que aún cambian: una ventana ``emissiondaterange``
+    ya cerrada se reutiliza siempre, una que incluye el presente nunca, y el resto
+    de las respuestas (catálogos, detalles, variantes) durante ``ttl`` segundos.
+    """
+
+    def __init__(
+        self,
+        root: str = RESPONSE_CACHE_DIR,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        replay: bool = False,
+        account: str = "",
+        ttl: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.ttl = ttl
+        self.account = account
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def settings(self) -> ResponseCacheSettings:
+        """Picklable settings to rebuild the cache in worker processes."""
+        return self.root, self.max_bytes, self.replay, self.ttl
+
+    def _path(self, url: str, query: Dict[str, Any]) -> str:
+        key = cache_key(url, query, self.account)
+        return os.path.join(self.root, key[:2], f"{key}{_SUFFIX}")
+
+    def max_age(self, query: Dict[str, Any]) -> Optional[float]:
+        """Seconds a recorded response may be reused for ``query`` (``None`` = no limit)."""
+        if self.replay:
+            return None
+        end = _window_end(query)
+        if end is not None:
+            return None if end < time.time() else 0.0
+        return self.ttl
+
+    def get(self, url: str, query: Dict[str, Any]) -> Any:
+        """Decoded payload for ``url``/``query`` or ``None`` on a miss (absent or too old)."""
+        path = self._path(url, query)
+        try:
+            recorded_at = os.stat(path).st_mtime
+            max_age = self.max_age(query)
+            if max_age is not None and time.time() - recorded_at > max_age:
+                return None
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Solo se renueva el acceso: la modificación sigue marcando la grabación.
+            os.utime(path, (time.time(), recorded_at))
+        except OSError:
+            pass
+        return payload
+
+    def put(self, url: str, query: Dict[str, Any], payload: Any) -> None:
+        path = self._path(url, query)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(_SUFFIX):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_atime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
@@ -0,0 +1,175 @@
+"""Incremental document sync backed by a local SQLite document store."""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .api_client import account_key
+
+
+STORE_DIR = os.path.join("data", "store")
+STORE_PATH = os.path.join(STORE_DIR, "documents.sqlite")
+
+# Hasta esta distancia tras el high-water mark se rellena el hueco en vez de reiniciar el tramo.
+MAX_GAP_SECONDS = 7 * 86400
+
+FetchWindow = Callable[[int, int], List[Dict]]
+
+
+@dataclass
+class SyncState:
+    """
+    High-water mark de una cuenta.
+
+    ``synced_from`` marca el inicio del tramo continuo ya sincronizado y
+    ``last_emission_date`` / ``last_id`` el documento más reciente recibido.
+    """
+
+    synced_from: int
+    last_emission_date: int
+    last_id: int
+
+
+class DocumentStore:
+    """Documentos crudos de Bsale persistidos por cuenta, con upsert por ``id``."""
+
+    def __init__(self, path: str = STORE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                account TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                emission_date INTEGER,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (account, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_emission
+                ON documents (account, emission_date);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                account TEXT PRIMARY KEY,
+                synced_from INTEGER NOT NULL,
+                last_emission_date INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            """
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "DocumentStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def upsert_documents(self, account: str, documents: Iterable[Dict]) -> int:
+        rows = [
+            (account, int(doc["id"]), doc.get("emissionDate"), json.dumps(doc, ensure_ascii=False))
+            for doc in documents
+            if doc.get("id") is not None
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO documents (account, id, emission_date, payload) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (account, id) DO UPDATE SET "
+                "emission_date = excluded.emission_date, payload = excluded.payload",
+                rows,
+            )
+        return len(rows)
+
+    def load_documents(self, account: str, start_unix: int, end_unix: int) -> List[Dict]:
+        cursor = self._conn.execute(
+            "SELECT payload FROM documents WHERE account = ? AND emission_date BETWEEN ? AND ? "
+            "ORDER BY emission_date, id",
+            (account, start_unix, end_unix),
+        )
+        return [json.loads(payload) for (payload,) in cursor]
+
+    def get_state(self, account: str) -> Optional[SyncState]:
+        row = self._conn.execute(
+            "SELECT synced_from, last_emission_date, last_id FROM sync_state WHERE account = ?",
+            (account,),
+        ).fetchone()
+        return SyncState(*row) if row else None
+
+    def save_state(self, account: str, state: SyncState) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO sync_state (account, synced_from, last_emission_date, last_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (account) DO UPDATE SET "
+                "synced_from = excluded.synced_from, last_emission_date = excluded.last_emission_date, "
+                "last_id = excluded.last_id, updated_at = excluded.updated_at",
+                (
+                    account,
+                    state.synced_from,
+                    state.last_emission_date,
+                    state.last_id,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+
+def sync_documents(
+    start_unix: int,
+    end_unix: int,
+    fetch_window: FetchWindow,
+    *,
+    store: Optional[DocumentStore] = None,
+    debug: bool = False,
+) -> List[Dict]:
+    """
+    Sincroniza incrementalmente ``[start_unix, end_unix]`` y devuelve los documentos del rango.
+
+    Si el rango empieza dentro del tramo ya sincronizado (o poco después) solo se piden
+    documentos desde el día del último ``emissionDate`` registrado (se repite ese día
+    porque pudo quedar incompleto); el resto sale del store local. Si el rango queda
+    fuera del tramo continuo conocido se descarga completo y el tramo se reinicia en
+    ``start_unix``.
+    """
+    owns_store = store is None
+    store = store or DocumentStore()
+    account = account_key()
+    try:
+        state = store.get_state(account)
+        if (
+            state is None
+            or start_unix < state.synced_from
+            or start_unix - state.last_emission_date > MAX_GAP_SECONDS
+        ):
+            fetch_from = start_unix
+            synced_from = start_unix
+            last_emission_date, last_id = start_unix, 0
+        else:
+            fetch_from = state.last_emission_date
+            synced_from = state.synced_from
+            last_emission_date, last_id = state.last_emission_date, state.last_id
+
+        if fetch_from <= end_unix:
+            fetched = fetch_window(fetch_from, end_unix)
+            store.upsert_documents(account, fetched)
+            for doc in fetched:
+                emission = doc.get("emissionDate")
+                if emission is not None and int(emission) >= last_emission_date:
+                    last_emission_date = int(emission)
+                if doc.get("id") is not None:
+                    last_id = max(last_id, int(doc["id"]))
+            store.save_state(account, SyncState(synced_from, last_emission_date, last_id))
+            if debug:
+                print(f"ℹ️ sync incremental: {len(fetched)} documentos desde {fetch_from}")
+        elif debug:
+            print("ℹ️ sync incremental: rango ya cubierto por el store local")
+
+        return store.load_documents(account, start_unix, end_unix)
+    finally:
+        if owns_store:
+            store.close()
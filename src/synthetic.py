@@ -0,0 +1,141 @@
+"""Synthetic Bsale-shaped documents for benchmarks and offline runs."""
+
+from __future__ import annotations
+
+import random
+from typing import Dict, Iterator, List
+
+
+DOCUMENT_TYPE_IDS = (1, 6, 9, 23)
+N_OFFICES = 5
+N_USERS = 40
+N_PRICE_LISTS = 10
+DAY_SECONDS = 86400
+
+
+def _build_document(
+    index: int,
+    rng: random.Random,
+    *,
+    lines_per_document: int,
+    n_variants: int,
+    start_unix: int,
+    days: int,
+) -> Dict:
+    doc_id = index + 1
+    items: List[Dict] = []
+    for line in range(rng.randint(1, max(2 * lines_per_document - 1, 1))):
+        quantity = rng.randint(1, 5)
+        gross_unit = float(rng.choice((990, 1990, 4990, 9990, 19990)))
+        net_unit = round(gross_unit / 1.19, 2)
+        discount = float(rng.choice((0, 0, 0, 500)))
+        total = gross_unit * quantity - discount
+        variant_id = rng.randint(1, n_variants)
+        items.append(
+            {
+                "id": doc_id * 100 + line,
+                "lineNumber": line + 1,
+                "quantity": quantity,
+                "netUnitValue": net_unit,
+                "totalUnitValue": gross_unit,
+                "netAmount": round(total / 1.19, 2),
+                "taxAmount": round(total - total / 1.19, 2),
+                "totalAmount": total,
+                "totalDiscount": discount,
+                "variant": {
+                    "id": variant_id,
+                    "code": f"SKU-{variant_id:05d}",
+                    "description": f"Producto sintético {variant_id}",
+                },
+            }
+        )
+
+    net_amount = round(sum(item["netAmount"] for item in items), 2)
+    total_amount = sum(item["totalAmount"] for item in items)
+    office_id = rng.randint(1, N_OFFICES)
+    user_id = rng.randint(1, N_USERS)
+    return {
+        "id": doc_id,
+        "number": 100000 + doc_id,
+        "emissionDate": emission_date_of(index, start_unix=start_unix, days=days),
+        "documentTypeId": rng.choice(DOCUMENT_TYPE_IDS),
+        "trackingNumber": None,
+        "token": f"tok{doc_id:08x}",
+        "netAmount": net_amount,
+        "taxAmount": round(total_amount - net_amount, 2),
+        "totalAmount": total_amount,
+        "totalDiscount": sum(item["totalDiscount"] for item in items),
+        "client": {
+            "id": rng.randint(1, 5000),
+            "firstName": "Cliente",
+            "lastName": str(doc_id % 997),
+            "company": None,
+            "code": f"{rng.randint(5_000_000, 25_000_000)}-{rng.randint(0, 9)}",
+        },
+        "office": {"id": office_id, "name": f"Sucursal {office_id}"},
+        "user": {"id": user_id},
+        "coin": {"id": 1, "code": "CLP"},
+        "priceList": {"id": rng.randint(1, N_PRICE_LISTS)},
+        "details": {"count": len(items), "limit": 50, "offset": 0, "items": items},
+    }
+
+
+def emission_date_of(index: int, *, start_unix: int = 1704067200, days: int = 30) -> int:
+    """``emissionDate`` of the document at ``index``: documents cycle over ``days`` days."""
+    return start_unix + DAY_SECONDS * (index % max(days, 1))
+
+
+def generate_documents(
+    n_documents: int,
+    *,
+    lines_per_document: int = 4,
+    n_variants: int = 2000,
+    start_unix: int = 1704067200,
+    days: int = 30,
+    seed: int = 0,
+) -> Iterator[Dict]:
+    """
+    Yield documents shaped like ``/documents.json`` with ``expand=details,client,office,...``.
+
+    ``lines_per_document`` is the average number of detail items (1..2x-1 uniformly),
+    so ``n_documents * lines_per_document`` approximates the line-item count.
+    """
+    rng = random.Random(seed)
+    for index in range(n_documents):
+        yield _build_document(
+            index,
+            rng,
+            lines_per_document=lines_per_document,
+            n_variants=n_variants,
+            start_unix=start_unix,
+            days=days,
+        )
+
+
+def document_at(
+    index: int,
+    *,
+    lines_per_document: int = 4,
+    n_variants: int = 2000,
+    start_unix: int = 1704067200,
+    days: int = 30,
+    seed: int = 0,
+) -> Dict:
+    """
+    Random-access variant of ``generate_documents``: the document at ``index`` is
+    deterministic on its own, so a server can build any page without generating
+    the ones before it (values differ from the sequential generator).
+    """
+    return _build_document(
+        index,
+        random.Random(seed * 1_000_003 + index),
+        lines_per_document=lines_per_document,
+        n_variants=n_variants,
+        start_unix=start_unix,
+        days=days,
+    )
+
+
+def variant_cost(variant_id: int) -> float:
+    """Synthetic net unit cost of a variant (roughly 40-70% of the cheapest list price)."""
+    return float(400 + (variant_id * 37) % 300)
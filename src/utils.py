@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 import os
-from typing import Iterable, List
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
-from pandas import json_normalize
 
-from .catalogs import get_all_maps
+from .catalogs import CatalogMaps, get_all_maps
+from .metrics import METRICS
 
 
 EXPECTED_COLUMNS: List[str] = [
@@ -37,6 +37,8 @@ EXPECTED_COLUMNS: List[str] = [
     "% Margen",
 ]
 
+STREAM_COLUMNS: List[str] = EXPECTED_COLUMNS + ["_warn_monto"]
+
 
 def ensure_data_dir(path: str = "data") -> None:
     os.makedirs(path, exist_ok=True)
@@ -54,6 +56,27 @@ def _as_num(df: pd.DataFrame, columns: Iterable[str], index) -> pd.Series:
     return pd.to_numeric(series, errors="coerce").astype(float).fillna(0.0)
 
 
+def _as_ids(series: pd.Series) -> pd.Series:
+    """Coerce an id column (ints, floats with NaN or numeric strings) to nullable Int64."""
+    return pd.to_numeric(series, errors="coerce").astype("Int64")
+
+
+def _lookup_names(ids: pd.Series, mapping: Dict[int, str]) -> pd.Series:
+    """Vectorized ``mapping.get(id, "")`` via an index join instead of a per-row lambda."""
+    if not mapping:
+        return pd.Series("", index=ids.index, dtype="object")
+    catalog = pd.Series(mapping, dtype="object")
+    catalog.index = catalog.index.astype("int64")
+    return ids.map(catalog).fillna("")
+
+
+def _count_join(catalog: str, ids: pd.Series, resolved: pd.Series) -> None:
+    """Contadores de cobertura de un catálogo: líneas con id y cuántas encontraron valor."""
+    has_id = ids.notna()
+    METRICS.inc("join_lookups_total", int(has_id.sum()), labels={"catalog": catalog})
+    METRICS.inc("join_hits_total", int((has_id & resolved.notna() & (resolved != "") & (resolved != 0)).sum()), labels={"catalog": catalog})
+
+
 def _fmt_date(unix_series: pd.Series) -> pd.Series:
     dt = pd.to_datetime(unix_series, unit="s", errors="coerce")
     return dt.dt.strftime("%d/%m/%Y")
@@ -91,45 +114,146 @@ def _warn_monto(out: pd.DataFrame) -> None:
         out.loc[warn_mask, "_warn_monto"] = "REVISA"
 
 
-def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
-    ensure_data_dir(os.path.dirname(out_csv) or "data")
+# Esquema de salida del aplanador: (columna, ruta dentro del documento o del ítem).
+DOC_FIELDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("doc.id", ("id",)),
+    ("doc.number", ("number",)),
+    ("doc.emissionDate", ("emissionDate",)),
+    ("doc.documentTypeId", ("documentTypeId",)),
+    ("doc.trackingNumber", ("trackingNumber",)),
+    ("doc.token", ("token",)),
+    ("doc.document_type.name", ("document_type", "name")),
+    ("doc.documentType.name", ("documentType", "name")),
+    ("doc.office.id", ("office", "id")),
+    ("doc.office.name", ("office", "name")),
+    ("doc.user.id", ("user", "id")),
+    ("doc.user.name", ("user", "name")),
+    ("doc.client.firstName", ("client", "firstName")),
+    ("doc.client.lastName", ("client", "lastName")),
+    ("doc.client.company", ("client", "company")),
+    ("doc.client.code", ("client", "code")),
+    ("doc.priceList.id", ("priceList", "id")),
+    ("doc.priceList.name", ("priceList", "name")),
+    ("doc.coin.code", ("coin", "code")),
+)
+
+ITEM_FIELDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("id", ("id",)),
+    ("quantity", ("quantity",)),
+    ("listPrice", ("listPrice",)),
+    ("netUnitValue", ("netUnitValue",)),
+    ("totalUnitValue", ("totalUnitValue",)),
+    ("netAmount", ("netAmount",)),
+    ("taxAmount", ("taxAmount",)),
+    ("totalAmount", ("totalAmount",)),
+    ("totalDiscount", ("totalDiscount",)),
+    ("variant.id", ("variant", "id")),
+    ("variant.code", ("variant", "code")),
+    ("variant.description", ("variant", "description")),
+)
+
+
+def _dig(obj, path: Tuple[str, ...]):
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def normalize_documents(documents: Iterable[dict]) -> pd.DataFrame:
+    """
+    Flatten documents into one row per detail line (``doc.*`` columns carry the header).
+
+    Single pass over the Bsale document/detail schema: every value is appended to
+    one list per output column and the DataFrame is built once at the end.
+    Documents without ``details.items`` produce no rows.
+    """
+
+    doc_columns: Dict[str, list] = {name: [] for name, _ in DOC_FIELDS}
+    item_columns: Dict[str, list] = {name: [] for name, _ in ITEM_FIELDS}
+    doc_lists = [(doc_columns[name], path) for name, path in DOC_FIELDS]
+    item_lists = [(item_columns[name], path) for name, path in ITEM_FIELDS]
+
+    for document in documents:
+        details = document.get("details")
+        items = details.get("items") if isinstance(details, dict) else None
+        if not items:
+            continue
+
+        repeat = len(items)
+        for values, path in doc_lists:
+            values.extend([_dig(document, path)] * repeat)
+        for item in items:
+            for values, path in item_lists:
+                values.append(item.get(path[0]) if len(path) == 1 else _dig(item, path))
+
+    return pd.DataFrame({**item_columns, **doc_columns})
+
+
+def _point_in_time_cost(df_items: pd.DataFrame, dim_variant: pd.DataFrame, index) -> pd.Series:
+    """
+    Unit net cost of each line as of its emission date, in a single ``merge_asof`` pass.
+
+    ``dim_variant`` may carry an ``effective_from`` column (unix) with several rows per
+    variant (cost history); without it each cost applies to every date. Lines whose
+    variant has no current cost (missing or 0) are first remapped by SKU to a variant
+    that has one, so the SKU fallback no longer needs a second merge.
+    """
+    if dim_variant is None or dim_variant.empty:
+        return pd.Series(0.0, index=index)
+
+    effective_from = (
+        pd.to_numeric(dim_variant["effective_from"], errors="coerce").fillna(0.0)
+        if "effective_from" in dim_variant.columns
+        else 0.0
+    )
+    history = pd.DataFrame(
+        {
+            "variant_id": _as_ids(dim_variant["variant_id"]),
+            "sku": dim_variant["sku"].astype(str),
+            "cost_net_unit": pd.to_numeric(dim_variant["cost_net_unit"], errors="coerce").fillna(0.0),
+            "effective_from": effective_from,
+        }
+    ).dropna(subset=["variant_id"])
+    history = history.sort_values("effective_from", kind="stable")
+
+    current = history.drop_duplicates("variant_id", keep="last")
+    costed = current[current["cost_net_unit"] > 0]
+    sku_to_variant = costed.drop_duplicates("sku").set_index("sku")["variant_id"]
+
+    # Ambos lados del join como Int64: la caché Feather ya guarda variant_id tipado.
+    variant_id = _as_ids(_as_series(df_items, ["variant.id", "doc.variant.id"], index))
+    sku = _as_series(df_items, ["variant.code", "doc.variant.code"], index).astype(str)
+    by_sku = _as_ids(sku.map(sku_to_variant)).fillna(variant_id)
+    resolved = variant_id.where(variant_id.isin(costed["variant_id"]).fillna(False), by_sku)
+
+    # Líneas sin fecha toman el costo vigente; sin variante no encuentran costo (-1).
+    emission = pd.to_numeric(_as_series(df_items, ["doc.emissionDate"], index), errors="coerce")
+    lines = pd.DataFrame(
+        {
+            "__row__": range(len(index)),
+            "variant_id": resolved.fillna(-1).astype("int64").to_numpy(),
+            "as_of": emission.fillna(float("inf")).astype("float64").to_numpy(),
+        }
+    ).sort_values("as_of", kind="stable")
+    joined = pd.merge_asof(
+        lines,
+        history[["variant_id", "effective_from", "cost_net_unit"]].astype({"variant_id": "int64", "effective_from": "float64"}),
+        left_on="as_of",
+        right_on="effective_from",
+        by="variant_id",
+        direction="backward",
+    )
+    cost = joined.sort_values("__row__")["cost_net_unit"].fillna(0.0).to_numpy()
+    return pd.Series(cost, index=index)
 
-    if not documents:
-        pd.DataFrame(columns=EXPECTED_COLUMNS).to_csv(out_csv, index=False, encoding="utf-8-sig")
-        print("⚠️ No llegaron documentos.")
-        return
 
-    df_items = json_normalize(
-        documents,
-        record_path=["details", "items"],
-        meta=[
-            "id",
-            "number",
-            "emissionDate",
-            "documentTypeId",
-            "trackingNumber",
-            "token",
-            ["document_type", "name"],
-            ["documentType", "name"],
-            ["office", "id"],
-            ["office", "name"],
-            ["user", "id"],
-            ["user", "name"],
-            ["client", "firstName"],
-            ["client", "lastName"],
-            ["client", "company"],
-            ["client", "code"],
-            ["priceList", "id"],
-            ["priceList", "name"],
-            ["coin", "code"],
-            ["variant", "id"],
-            ["variant", "code"],
-            ["variant", "description"],
-        ],
-        sep=".",
-        errors="ignore",
-        meta_prefix="doc.",
-    )
+def build_report_frame(df_items: pd.DataFrame, maps: CatalogMaps) -> pd.DataFrame:
+    """Enrich normalized line items with catalogs and costs into report rows."""
+
+    if df_items.empty:
+        return pd.DataFrame(columns=EXPECTED_COLUMNS)
 
     (
         doc_type_map,
@@ -137,7 +261,7 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
         price_list_map,
         office_map,
         dim_variant,
-    ) = get_all_maps(refresh=False)
+    ) = maps
 
     index = df_items.index
 
@@ -145,23 +269,22 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
         _as_series(df_items, ["doc.document_type.name"], index),
         _as_series(df_items, ["doc.documentType.name"], index),
     )
-    doc_type_id_raw = _as_series(df_items, ["doc.documentTypeId"], index)
-    doc_type_from_map = doc_type_id_raw.map(
-        lambda value: doc_type_map.get(int(value), "") if pd.notna(value) else ""
-    )
-    doc_type_id_str = doc_type_id_raw.map(lambda value: str(int(value)) if pd.notna(value) else "")
+    doc_type_id = _as_ids(_as_series(df_items, ["doc.documentTypeId"], index))
+    doc_type_from_map = _lookup_names(doc_type_id, doc_type_map)
+    _count_join("document_types", doc_type_id, doc_type_from_map)
+    doc_type_id_str = doc_type_id.astype("string").fillna("")
     tipo_documento = _first_non_empty(doc_type_from_expand, doc_type_from_map, doc_type_id_str)
 
     vendedor_expand = _as_series(df_items, ["doc.user.name"], index)
-    vendedor_map = _as_series(df_items, ["doc.user.id"], index).map(
-        lambda value: user_map.get(int(value), "") if pd.notna(value) else ""
-    )
+    user_id = _as_ids(_as_series(df_items, ["doc.user.id"], index))
+    vendedor_map = _lookup_names(user_id, user_map)
+    _count_join("users", user_id, vendedor_map)
     vendedor = _first_non_empty(vendedor_expand, vendedor_map)
 
     oficina_expand = _as_series(df_items, ["doc.office.name"], index)
-    oficina_map = _as_series(df_items, ["doc.office.id"], index).map(
-        lambda value: office_map.get(int(value), "") if pd.notna(value) else ""
-    )
+    office_id = _as_ids(_as_series(df_items, ["doc.office.id"], index))
+    oficina_map = _lookup_names(office_id, office_map)
+    _count_join("offices", office_id, oficina_map)
     sucursal = _first_non_empty(oficina_expand, oficina_map)
 
     cliente_nombre = _first_non_empty(
@@ -174,9 +297,9 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
     )
 
     lista_expand = _as_series(df_items, ["doc.priceList.name"], index)
-    lista_map = _as_series(df_items, ["doc.priceList.id"], index).map(
-        lambda value: price_list_map.get(int(value), "") if pd.notna(value) else ""
-    )
+    price_list_id = _as_ids(_as_series(df_items, ["doc.priceList.id"], index))
+    lista_map = _lookup_names(price_list_id, price_list_map)
+    _count_join("price_lists", price_list_id, lista_map)
     lista_precio = _first_non_empty(lista_expand, lista_map)
 
     moneda = _first_non_empty(
@@ -184,27 +307,8 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
         pd.Series(["CLP"] * len(index), index=index),
     )
 
-    variant_id = pd.to_numeric(_as_series(df_items, ["doc.variant.id"], index), errors="coerce")
-    joined = pd.DataFrame({"__row__": index, "variant_id": variant_id})
-    joined = joined.merge(dim_variant, how="left", on="variant_id")
-    missing_cost = joined["cost_net_unit"].isna() | (joined["cost_net_unit"] == 0)
-    if missing_cost.any():
-        sku_series = _as_series(df_items, ["doc.variant.code"], index).astype(str)
-        dim_by_sku = dim_variant[["sku", "cost_net_unit"]].dropna()
-        joined.loc[missing_cost, "sku"] = sku_series[missing_cost]
-        joined = joined.merge(
-            dim_by_sku.rename(columns={"cost_net_unit": "cost_from_sku"}),
-            how="left",
-            on="sku",
-        )
-        joined["cost_net_unit"] = joined["cost_net_unit"].fillna(0.0)
-        joined.loc[missing_cost, "cost_net_unit"] = (
-            joined.loc[missing_cost, "cost_net_unit"].where(
-                joined.loc[missing_cost, "cost_net_unit"] > 0, joined.loc[missing_cost, "cost_from_sku"].fillna(0.0)
-            )
-        )
-
-    cost_unit = joined.set_index("__row__")["cost_net_unit"].reindex(index).fillna(0.0)
+    cost_unit = _point_in_time_cost(df_items, dim_variant, index)
+    _count_join("variant_costs", _as_series(df_items, ["variant.id", "variant.code"], index), cost_unit)
 
     precio_lista_raw = _as_series(df_items, ["listPrice"], index)
     precio_lista = pd.to_numeric(precio_lista_raw, errors="coerce")
@@ -243,8 +347,10 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
     out["Cliente RUT"] = _as_clean_str(_as_series(df_items, ["doc.client.code"], index))
     out["Lista de Precio"] = _as_clean_str(lista_precio)
     out["Moneda"] = _as_clean_str(moneda)
-    out["SKU"] = _as_clean_str(_as_series(df_items, ["doc.variant.code"], index))
-    out["Producto / Servicio"] = _as_clean_str(_as_series(df_items, ["doc.variant.description"], index))
+    out["SKU"] = _as_clean_str(_as_series(df_items, ["variant.code", "doc.variant.code"], index))
+    out["Producto / Servicio"] = _as_clean_str(
+        _as_series(df_items, ["variant.description", "doc.variant.description"], index)
+    )
     out["Precio Neto Unitario"] = precio_neto_unitario
     out["Precio Bruto Unitario"] = precio_bruto_unitario
     out["Cantidad"] = cantidad
@@ -267,6 +373,126 @@ def build_reporte_ventas(documents: List[dict], out_csv: str) -> None:
 
     _warn_monto(out)
 
-    out = out[EXPECTED_COLUMNS + (["_warn_monto"] if "_warn_monto" in out.columns else [])]
-    out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+    return out
+
+
+def _transform_documents(
+    documents: List[dict],
+    maps: Optional[CatalogMaps],
+    maps_for: Optional[Callable[[pd.DataFrame], CatalogMaps]] = None,
+) -> pd.DataFrame:
+    """Turn a batch of documents into report rows (one per detail line)."""
+    with METRICS.stage("normalize"):
+        df_items = normalize_documents(documents)
+    METRICS.inc("rows_normalized_total", len(df_items))
+    if maps_for is not None:
+        maps = maps_for(df_items)
+    with METRICS.stage("enrich"):
+        return build_report_frame(df_items, maps)
+
+
+def _write_report(out: pd.DataFrame, out_csv: str, columns: Optional[List[str]] = None) -> None:
+    out = out[(columns or EXPECTED_COLUMNS) + (["_warn_monto"] if "_warn_monto" in out.columns else [])]
+    with METRICS.stage("write_csv"):
+        out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+    METRICS.inc("rows_written_total", len(out))
     print(f"✅ Reporte generado en {out_csv} — {len(out)} filas")
+
+
+def build_reporte_ventas(
+    documents: List[dict],
+    out_csv: str,
+    maps: Optional[CatalogMaps] = None,
+    columns: Optional[List[str]] = None,
+) -> None:
+    ensure_data_dir(os.path.dirname(out_csv) or "data")
+
+    if not documents:
+        pd.DataFrame(columns=columns or EXPECTED_COLUMNS).to_csv(out_csv, index=False, encoding="utf-8-sig")
+        print("⚠️ No llegaron documentos.")
+        return
+
+    out = _transform_documents(documents, maps if maps is not None else get_all_maps(refresh=False))
+    _write_report(out, out_csv, columns)
+
+
+def build_reporte_ventas_from_items(
+    df_items: pd.DataFrame,
+    out_csv: str,
+    maps: Optional[CatalogMaps] = None,
+    columns: Optional[List[str]] = None,
+) -> None:
+    """Igual que ``build_reporte_ventas`` pero a partir de líneas ya normalizadas (p. ej. del store Parquet)."""
+    ensure_data_dir(os.path.dirname(out_csv) or "data")
+
+    if df_items.empty:
+        pd.DataFrame(columns=columns or EXPECTED_COLUMNS).to_csv(out_csv, index=False, encoding="utf-8-sig")
+        print("⚠️ No llegaron documentos.")
+        return
+
+    if maps is None:
+        maps = get_all_maps(refresh=False)
+    with METRICS.stage("enrich"):
+        out = build_report_frame(df_items, maps)
+    _write_report(out, out_csv, columns)
+
+
+def build_reporte_ventas_stream(
+    pages: Iterable[List[dict]],
+    out_csv: str,
+    maps: Optional[CatalogMaps] = None,
+    *,
+    chunk_size: int = 2000,
+    columns: Optional[List[str]] = None,
+    maps_for: Optional[Callable[[pd.DataFrame], CatalogMaps]] = None,
+) -> int:
+    """
+    Variante en streaming de ``build_reporte_ventas``.
+
+    Consume páginas de documentos (por ejemplo desde ``iter_bsale_pages``),
+    transforma lotes de ~``chunk_size`` documentos y los agrega al CSV, escribiendo
+    la cabecera una sola vez. La columna ``_warn_monto`` siempre se incluye para que
+    todos los lotes compartan el mismo layout; ``columns`` restringe y ordena las demás.
+    Con ``maps_for`` los catálogos se resuelven por lote a partir de sus líneas
+    normalizadas (p. ej. variantes bajo demanda) en vez de usar ``maps``.
+    Devuelve el número de filas escritas.
+    """
+    ensure_data_dir(os.path.dirname(out_csv) or "data")
+    if maps is None and maps_for is None:
+        maps = get_all_maps(refresh=False)
+
+    columns = columns + ["_warn_monto"] if columns else STREAM_COLUMNS
+    rows_written = 0
+    header_written = False
+    buffer: List[dict] = []
+
+    def _flush() -> None:
+        nonlocal rows_written, header_written
+        out = _transform_documents(buffer, maps, maps_for).reindex(columns=columns)
+        with METRICS.stage("write_csv"):
+            out.to_csv(
+                out_csv,
+                index=False,
+                mode="a" if header_written else "w",
+                header=not header_written,
+                encoding="utf-8" if header_written else "utf-8-sig",
+            )
+        METRICS.inc("rows_written_total", len(out))
+        header_written = True
+        rows_written += len(out)
+        buffer.clear()
+
+    for page in pages:
+        buffer.extend(page)
+        if len(buffer) >= chunk_size:
+            _flush()
+    if buffer:
+        _flush()
+
+    if not header_written:
+        pd.DataFrame(columns=columns).to_csv(out_csv, index=False, encoding="utf-8-sig")
+        print("⚠️ No llegaron documentos.")
+        return 0
+
+    print(f"✅ Reporte generado en {out_csv} — {rows_written} filas")
+    return rows_written
@@ -0,0 +1,97 @@
+"""Shared fixtures: a local fake Bsale server and a runner for the CLI against it."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from dataclasses import replace
+from typing import Callable, Iterator, List, Optional
+
+import pytest
+
+os.environ.setdefault("BSALE_TOKEN", "test")
+
+from src import api_client  # noqa: E402
+from src.fake_server import FakeBsaleConfig, FakeBsaleServer, start_fake_server  # noqa: E402
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 200 documentos repartidos en 5 días desde 2024-01-01 (UTC).
+FAKE_CONFIG = FakeBsaleConfig(documents=200, lines_per_document=3, variants=300, days=5, seed=7)
+SINCE, UNTIL = "2024-01-01", "2024-01-05"
+
+
+@pytest.fixture(scope="session")
+def fake_server() -> Iterator[FakeBsaleServer]:
+    server = start_fake_server(FAKE_CONFIG)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def start_server() -> Iterator[Callable[..., FakeBsaleServer]]:
+    """Start extra fake servers with ``FAKE_CONFIG`` overrides; they stop when the test ends."""
+    servers: List[FakeBsaleServer] = []
+
+    def start(**overrides) -> FakeBsaleServer:
+        server = start_fake_server(replace(FAKE_CONFIG, **overrides))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _point_client(monkeypatch: pytest.MonkeyPatch, server: FakeBsaleServer) -> FakeBsaleServer:
+    monkeypatch.setattr(api_client, "BASE_URL", server.base_url)
+    monkeypatch.setattr(api_client, "_RATE_LIMITER", api_client._RateLimiter(1e6))
+    monkeypatch.setattr(api_client, "_RESPONSE_CACHE", None)
+    return server
+
+
+@pytest.fixture
+def bsale(fake_server: FakeBsaleServer, monkeypatch: pytest.MonkeyPatch) -> FakeBsaleServer:
+    """Point the in-process client at the fake server, without rate limiting or response cache."""
+    return _point_client(monkeypatch, fake_server)
+
+
+@pytest.fixture
+def bsale_with(start_server, monkeypatch: pytest.MonkeyPatch) -> Callable[..., FakeBsaleServer]:
+    """Like ``bsale`` but against a new server built from ``FAKE_CONFIG`` overrides."""
+    return lambda **overrides: _point_client(monkeypatch, start_server(**overrides))
+
+
+@pytest.fixture
+def run_cli(fake_server: FakeBsaleServer, tmp_path):
+    """
+    Run ``python -m src.main`` in ``tmp_path`` (its own data/ dir) against the fake server,
+    or against ``server``; keyword arguments are extra environment variables.
+    """
+
+    def run(*args: str, server: Optional[FakeBsaleServer] = None, **extra_env: str) -> subprocess.CompletedProcess:
+        env = dict(
+            os.environ,
+            BSALE_TOKEN="test",
+            BSALE_BASE_URL=(server or fake_server).base_url,
+            BSALE_RATE_LIMIT="1000",
+            PYTHONPATH=REPO_ROOT,
+            TZ="UTC",
+            **extra_env,
+        )
+        result = subprocess.run(
+            [sys.executable, "-m", "src.main", *args],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=300,
+        )
+        assert result.returncode == 0, result.stderr
+        return result
+
+    return run
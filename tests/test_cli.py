@@ -0,0 +1,96 @@
+"""End-to-end CLI runs against the fake server: replay, incremental sync, multi-process backfill and 429s."""
+
+from __future__ import annotations
+
+import json
+import random
+
+import pandas as pd
+
+from .conftest import FAKE_CONFIG, SINCE, UNTIL
+
+
+RANGE = ("--since", SINCE, "--until", UNTIL)
+
+
+def _report(path) -> pd.DataFrame:
+    report = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return report.drop(columns=["_warn_monto"], errors="ignore")
+
+
+def _sorted(report: pd.DataFrame) -> pd.DataFrame:
+    return report.sort_values(list(report.columns)).reset_index(drop=True)
+
+
+def test_report_covers_every_document(run_cli, fake_server, tmp_path):
+    run_cli(*RANGE, "--out", "report.csv")
+    report = _report(tmp_path / "report.csv")
+
+    lines = sum(len(fake_server.fake.document(index)["details"]["items"]) for index in range(FAKE_CONFIG.documents))
+    assert len(report) == lines
+    assert report["Tracking number"].nunique() == FAKE_CONFIG.documents
+    assert (report["Costo neto unitario"].astype(float) > 0).all()
+
+
+def test_replay_reproduces_recorded_run(run_cli, fake_server, tmp_path):
+    run_cli(*RANGE, "--response-cache", "--out", "recorded.csv")
+    requests_before = sum(fake_server.fake.stats.values())
+    run_cli(*RANGE, "--replay", "--out", "replayed.csv")
+
+    # Todo tiene que salir de data/cache/responses, sin tocar el servidor.
+    assert sum(fake_server.fake.stats.values()) == requests_before
+    pd.testing.assert_frame_equal(_report(tmp_path / "replayed.csv"), _report(tmp_path / "recorded.csv"))
+
+
+def test_incremental_sync_matches_full_fetch(run_cli, tmp_path):
+    run_cli(*RANGE, "--out", "full.csv")
+    run_cli("--since", SINCE, "--until", "2024-01-02", "--incremental", "--out", "first.csv")
+    run_cli(*RANGE, "--incremental", "--out", "incremental.csv")
+
+    first = _report(tmp_path / "first.csv")
+    incremental = _report(tmp_path / "incremental.csv")
+    assert 0 < len(first) < len(incremental)
+    pd.testing.assert_frame_equal(_sorted(incremental), _sorted(_report(tmp_path / "full.csv")))
+
+
+def test_workers_backfill_matches_single_process(run_cli, tmp_path):
+    # Primero el backfill, con la caché de catálogos fría: el proceso padre abre conexiones
+    # antes de lanzar los workers.
+    run_cli(*RANGE, "--workers", "2", "--out", "backfill.csv", "--metrics-out", "metrics.json")
+    run_cli(*RANGE, "--out", "single.csv")
+
+    backfill = _report(tmp_path / "backfill.csv")
+    assert not backfill.duplicated().any()
+    # El servidor no inyecta fallas: un reintento delata respuestas cruzadas entre procesos.
+    with open(tmp_path / "metrics.json", encoding="utf-8") as handle:
+        assert json.load(handle)["counters"].get("retries_total", 0) == 0
+    pd.testing.assert_frame_equal(_sorted(backfill), _sorted(_report(tmp_path / "single.csv")))
+
+
+def test_names_missing_from_cached_catalog_are_refreshed(run_cli, tmp_path):
+    run_cli(*RANGE, "--out", "first.csv")
+    # Una sucursal creada después de la última descarga del catálogo (que sigue vigente).
+    path = tmp_path / "data" / "cache" / "offices.json"
+    with open(path, encoding="utf-8") as handle:
+        offices = json.load(handle)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({key: value for key, value in offices.items() if key != "1"}, handle)
+    run_cli(*RANGE, "--out", "second.csv")
+
+    second = _report(tmp_path / "second.csv")
+    assert (second["Sucursal"] != "").all()
+    pd.testing.assert_frame_equal(second, _report(tmp_path / "first.csv"))
+
+
+def test_throttled_run_matches_clean_run(run_cli, start_server, tmp_path):
+    # El servidor sortea los 429 con random: semilla fija para que la corrida siempre los reciba.
+    random.seed(3)
+    throttled = start_server(rate_429=0.3, retry_after=0.01)
+    # Primero la corrida con 429, con la caché de catálogos fría.
+    run_cli(*RANGE, "--out", "throttled.csv", "--metrics-out", "metrics.json", server=throttled, BSALE_MAX_RETRIES="10")
+    run_cli(*RANGE, "--out", "clean.csv")
+
+    assert throttled.fake.stats["429"] > 0
+    with open(tmp_path / "metrics.json", encoding="utf-8") as handle:
+        assert json.load(handle)["counters"]["retries_total"] >= throttled.fake.stats["429"]
+    pd.testing.assert_frame_equal(_report(tmp_path / "throttled.csv"), _report(tmp_path / "clean.csv"))
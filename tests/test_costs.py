@@ -0,0 +1,49 @@
+"""Point-in-time cost join (``utils._point_in_time_cost``) on hand-built frames."""
+
+from __future__ import annotations
+
+import pandas as pd
+
+from src.utils import _point_in_time_cost
+
+
+DAY = 86400
+CHANGE = 1704067200 + 10 * DAY
+
+
+def _dim(rows):
+    return pd.DataFrame(rows, columns=["variant_id", "sku", "variant_description", "cost_net_unit", "effective_from"])
+
+
+def _costs(lines, dim_variant):
+    df_items = pd.DataFrame(lines, columns=["variant.id", "variant.code", "doc.emissionDate"])
+    return _point_in_time_cost(df_items, dim_variant, df_items.index).tolist()
+
+
+def test_cost_history_applies_by_emission_date():
+    dim_variant = _dim([(1, "A", "a", 10.0, 0.0), (1, "A", "a", 12.0, CHANGE)])
+    lines = [(1, "A", CHANGE - DAY), (1, "A", CHANGE), (1, "A", CHANGE + DAY)]
+
+    assert _costs(lines, dim_variant) == [10.0, 12.0, 12.0]
+
+
+def test_uncosted_variant_is_remapped_by_sku():
+    dim_variant = _dim([(2, "B", "sin costo", 0.0, 0.0), (3, "B", "con costo", 7.0, 0.0), (4, "C", "c", 5.0, 0.0)])
+    # Variante sin costo, variante desconocida con SKU conocido y variante con costo propio.
+    lines = [(2, "B", CHANGE), (99, "B", CHANGE), (4, "B", CHANGE)]
+
+    assert _costs(lines, dim_variant) == [7.0, 7.0, 5.0]
+
+
+def test_lines_without_date_or_variant():
+    dim_variant = _dim([(1, "A", "a", 10.0, 0.0), (1, "A", "a", 12.0, CHANGE)])
+    # Sin fecha se usa el costo vigente; sin variante ni SKU no hay costo.
+    lines = [(1, "A", None), (None, None, CHANGE)]
+
+    assert _costs(lines, dim_variant) == [12.0, 0.0]
+
+
+def test_dimension_without_history_applies_to_every_date():
+    dim_variant = _dim([(1, "A", "a", 10.0, 0.0)]).drop(columns="effective_from")
+
+    assert _costs([(1, "A", 0), (1, "A", CHANGE)], dim_variant) == [10.0, 10.0]
@@ -0,0 +1,65 @@
+"""Document helpers against the fake server: truncated details completion and sharding."""
+
+from __future__ import annotations
+
+from src import documents as documents_module
+from src.api_client import fetch_bsale_data
+from src.documents import complete_document_details, fetch_sharded_documents
+
+from .conftest import FAKE_CONFIG
+
+
+PARAMS = {"limit": 50}
+START = FAKE_CONFIG.start_unix
+END = START + FAKE_CONFIG.days * 86400 - 1
+
+
+def _item_ids(document):
+    return [item["id"] for item in document["details"]["items"]]
+
+
+def test_complete_details_beyond_embed_limit(bsale_with):
+    server = bsale_with(documents=60, lines_per_document=8, details_embed_limit=5)
+    documents = fetch_bsale_data("documents", {"limit": 50, "expand": "details"})
+    expected = {document["id"]: _item_ids(server.fake.document(index)) for index, document in enumerate(documents)}
+    truncated = sum(len(items) > 5 for items in expected.values())
+    assert truncated > 0
+
+    # limit=4: un mismo documento necesita varias páginas de /documents/{id}/details.
+    assert complete_document_details(documents, concurrency=4, limit=4) == truncated
+    assert {document["id"]: _item_ids(document) for document in documents} == expected
+    assert complete_document_details(documents) == 0
+
+
+def test_sharding_splits_oversized_windows(bsale, monkeypatch):
+    resolved = []
+    resolve_shards = documents_module._resolve_shards
+
+    def record(*args, **kwargs):
+        resolved.extend(resolve_shards(*args, **kwargs))
+        return resolved
+
+    monkeypatch.setattr(documents_module, "_resolve_shards", record)
+    # Cada día tiene 40 documentos: con umbral 10 todos se parten hasta ventanas de una hora.
+    sharded = fetch_sharded_documents(PARAMS, START, END, shard="day", split_threshold=10)
+
+    assert len(resolved) > FAKE_CONFIG.days
+    # Las ventanas partidas siguen cubriendo el rango completo, sin huecos ni solapes.
+    assert resolved[0][0] == START and resolved[-1][1] == END
+    assert all(previous[1] + 1 == current[0] for previous, current in zip(resolved, resolved[1:]))
+    # Mismos documentos que sin shards, en el orden de las ventanas.
+    unsharded = fetch_bsale_data("documents", PARAMS)
+    assert sorted(document["id"] for document in sharded) == [document["id"] for document in unsharded]
+    emission_dates = [document["emissionDate"] for document in sharded]
+    assert emission_dates == sorted(emission_dates)
+
+
+def test_sharding_deduplicates_overlapping_windows(bsale, monkeypatch):
+    # Ventanas que comparten el segundo en que empieza cada día: sus documentos llegan dos veces.
+    day = 86400
+    overlapping = [(START + offset * day, START + (offset + 1) * day) for offset in range(FAKE_CONFIG.days)]
+    monkeypatch.setattr(documents_module, "plan_shards", lambda start, end, seconds: overlapping)
+
+    sharded = fetch_sharded_documents(PARAMS, START, END, split_threshold=0)
+    ids = [document["id"] for document in sharded]
+    assert len(ids) == len(set(ids)) == FAKE_CONFIG.documents
@@ -0,0 +1,52 @@
+"""Sync, concurrent and async pagination must return the same documents in the same order."""
+
+from __future__ import annotations
+
+import asyncio
+
+from src import api_client
+from src.api_client import AsyncBsaleClient, fetch_bsale_conditional, fetch_bsale_data
+
+from .conftest import FAKE_CONFIG
+
+
+PARAMS = {"limit": 50, "expand": "details"}
+
+
+def _ids(documents):
+    return [document["id"] for document in documents]
+
+
+def test_sync_and_concurrent_pagination_match(bsale):
+    sequential = fetch_bsale_data("documents", PARAMS)
+    concurrent = fetch_bsale_data("documents", PARAMS, concurrency=4)
+
+    assert len(sequential) == FAKE_CONFIG.documents
+    assert _ids(concurrent) == _ids(sequential)
+
+
+def test_async_pagination_matches_sync(bsale):
+    async def fetch():
+        async with AsyncBsaleClient(concurrency=4) as client:
+            return await client.fetch_all("documents", PARAMS)
+
+    assert _ids(asyncio.run(fetch())) == _ids(fetch_bsale_data("documents", PARAMS))
+
+
+def test_concurrent_pagination_without_count_keeps_paging(bsale, monkeypatch):
+    get_page = api_client._get_page
+
+    def without_count(url, query):
+        payload = get_page(url, query)
+        return {key: value for key, value in payload.items() if key != "count"}
+
+    monkeypatch.setattr(api_client, "_get_page", without_count)
+    assert len(fetch_bsale_data("documents", PARAMS, concurrency=4)) == FAKE_CONFIG.documents
+
+
+def test_conditional_fetch_pages_concurrently(bsale):
+    sequential, _ = fetch_bsale_conditional("variants", {"limit": 50})
+    concurrent, _ = fetch_bsale_conditional("variants", {"limit": 50}, concurrency=4)
+
+    assert len(sequential) == FAKE_CONFIG.variants
+    assert _ids(concurrent) == _ids(sequential)